@@ -1,5 +1,7 @@
 from cdi.core.primitives  import JavaType,JavaConst
 from cdi.core.cql         import (Migrate, Merge)
+from cdi.core.batch       import Pipeline, batch
+from cdi.core.reflect     import reflect
 
 from cdi.core.expr import (Expr as SQLExpr, AND, IF, ELSE, Literal, MAX, One,
                                  COUNT, LEN, IN, GROUP_CONCAT, CONCAT, Literal, LT,
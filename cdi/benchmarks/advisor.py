@@ -0,0 +1,83 @@
+# External
+from typing  import List as L
+from sys     import argv
+from random  import Random
+from sqlite3 import connect, Connection
+
+# Internal
+from cdi                      import (Schema, Entity, Attr, FK, Int, Double, Varchar,
+                                      GROUP_CONCAT, SUBSELECT, GT)
+from cdi.core.classes         import Land, LandObj, Attr as Attr_
+from cdi.core.expr            import Literal
+from cdi.core.reflect         import indexes
+from cdi.core.advisor         import Advice, advise
+from cdi.benchmarks.unnest    import show
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+The indexes advised for a filtered landing with a correlated subselect (as in
+the science example's structures), and the SQLite query plans and times of its
+query before and after creating them. The advice is applied twice, as when a
+file is run again: the second time must create nothing
+
+    python -m cdi.benchmarks.advisor [n_structures] [atoms_per_structure]
+'''
+
+def fixture(n : int, k : int) -> Connection:
+    '''Structures with up to 2k atoms each, without any secondary index'''
+    rand = Random(0)
+    conn = connect(':memory:')
+    conn.execute('CREATE TABLE structures (id integer primary key, natoms int)')
+    conn.execute('CREATE TABLE atoms (id integer primary key, structure_id int, element_id int, x double)')
+    conn.executemany('INSERT INTO structures VALUES (?,?)', [(i,rand.randrange(4*k)) for i in range(n)])
+    atoms = [(s, rand.randrange(1,90), rand.random()) for s in range(n)
+                for _ in range(rand.randrange(1, 2 * k))]
+    conn.executemany('INSERT INTO atoms (structure_id,element_id,x) VALUES (?,?,?)', atoms)
+    return conn
+
+def apply(conn : Connection, advice : L[Advice]) -> int:
+    '''
+    What the statements of Advice.sql do on MySQL, with SQLite's catalog in
+    place of information_schema: the number of indexes created
+    '''
+    n = 0
+    for a in advice:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND "
+                            "tbl_name = ? AND name = ?", (a.table,a.name)).fetchone():
+            conn.execute(a.create())
+            n += 1
+    return n
+
+def plan(conn : Connection, q : str) -> L[str]:
+    return [r[-1] for r in conn.execute('EXPLAIN QUERY PLAN ' + q)]
+
+def main(n : int = 5000, k : int = 10) -> None:
+    conn   = fixture(n, k)
+    src    = Schema('src', [
+                Entity('structures', id = 'id', attrs = [Attr('natoms', Int)]),
+                Entity('atoms', id = 'id', attrs = [Attr('element_id', Int), Attr('x', Double)],
+                       fks = [FK('structure_id', 'structures')])])
+    structs,atoms = src['structures'], src['atoms']
+
+    comp   = SUBSELECT(GROUP_CONCAT(atoms['element_id']), tab = 'atoms',
+                       where = 'structure_id = structures.id')
+    where  = GT(structs['natoms'], Literal(4 * k - 3)) # a few percent of them
+    s      = src.schema()
+    land   = Land(s, [LandObj(s['structures'], {Attr_('comp','structures',Varchar.type(),False) : comp},
+                              where)])
+    advice = advise(land, indexes(conn))
+    print('\n'.join(map(str, advice)))
+    print('on MySQL:\n    %s'%';\n    '.join(advice[0].sql()))
+
+    q      = 'SELECT id, %s FROM structures WHERE %s'%(show(comp), show(where))
+    before = plan(conn, q), timed(lambda: conn.execute(q).fetchall(), 1)
+    assert apply(conn, advice) == len(advice)
+    after  = plan(conn, q), timed(lambda: conn.execute(q).fetchall())
+    assert not advise(land, indexes(conn)), 'advice not taken'
+    assert apply(conn, advice) == 0, 'indexes created twice'
+
+    for label,(p,t) in [('before',before),('after',after)]:
+        print('%s: %.3fs\n    %s'%(label, t, '\n    '.join(p)))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
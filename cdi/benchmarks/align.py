@@ -0,0 +1,63 @@
+# External
+from typing import List as L, Tuple as T
+from sys    import argv
+from re     import split,sub,findall
+
+# Internal
+from cdi                   import Migrate, Merge, Instance, Conn
+from cdi.core.cql          import CQL
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Single-pass CQL._align vs. the original regex-per-line, pass-per-pattern
+version: golden comparison on both example pipelines, then timing on a
+generated file
+
+    python -m cdi.benchmarks.align [megabytes]
+'''
+
+def legacy_align(fi : str) -> str:
+    '''The original implementation of CQL._align'''
+    pats = [r' [:=(AS)]',r'->',r'//']
+    def process(chunk:str,pat:str)->str:
+        lines  = chunk.replace('\t','    ').split('\n')
+        splits = [split(pat,line) for line in lines]
+        l      = max([len(s[0]) if len(s)==2 else 0 for s in splits])
+
+        return '\n'.join([line if len(s)!=2 else sub(pat,' '*(l-len(s[0]))+findall(pat,line)[0],line)
+                            for s,line in zip(splits,lines)])
+
+    for pat in pats:
+        chunks = fi.split('\n\n')
+        fi = '\n\n'.join([process(c,pat) for c in chunks])
+    return fi
+
+def examples() -> L[T[str,str]]:
+    '''Unaligned text of the example pipelines'''
+    from cdi.library_example.main  import src, tar, overlap, funcs, isrc, itar
+    from cdi.science_example.main  import oqmd, rich, fOQMD
+    from cdi.science_example.main  import overlap as sci, funcs as scifuncs
+    db   = Conn(db = 'bench', user = 'bench', pw = 'bench')
+    args = dict(src = oqmd, tar = rich, overlap = sci, filt1 = fOQMD,
+                funcs = scifuncs) # type: dict
+    raw  = lambda c, i, j, k: '\n\n\n'.join(s.show() for s in c.sections(i,j,k))
+    return [('library migrate', raw(Migrate(src = src, tar = tar, overlap = overlap,
+                                            funcs = funcs), isrc, itar, None)),
+            ('science migrate', raw(Migrate(**args), db, Instance(), db)),
+            ('science merge',   raw(Merge(**args),   db, Instance(), db))]
+
+def main(mb : int = 50) -> None:
+    texts = examples()
+    for name,fi in texts:
+        same = CQL._align(fi) == legacy_align(fi)
+        print('%-16s %s'%(name, 'identical' if same else 'DIFFERENT'))
+
+    merge = texts[-1][1]
+    big   = '\n\n\n'.join([merge] * (mb * 2**20 // len(merge) + 1))
+    print('%-16s %s'%('%dMB file'%mb, 'identical' if CQL._align(big) == legacy_align(big)
+                                            else 'DIFFERENT'))
+    old,new = timed(lambda: legacy_align(big), 1), timed(lambda: CQL._align(big), 1)
+    print('legacy %.2fs   single-pass %.2fs   (x%.1f)'%(old,new,old/new))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
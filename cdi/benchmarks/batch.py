@@ -0,0 +1,32 @@
+# External
+from typing   import List as L, Type
+from sys      import argv
+from tempfile import TemporaryDirectory
+from os.path  import join
+
+# Internal
+from cdi                      import Migrate, Merge, Instance, Conn, Pipeline, batch
+from cdi.core.cql             import CQL
+from cdi.benchmarks.synthetic import synthetic
+################################################################################
+'''
+A nightly-style batch: one Migrate and one Merge per source database, all into
+the same target schema
+
+    python -m cdi.benchmarks.batch [n_sources] [n_entities] [workers]
+'''
+
+def main(k : int = 8, n : int = 200, workers : int = 4) -> None:
+    src,tar,overlap = synthetic(n)
+    ops = [Migrate, Merge] # type: L[Type[CQL]]
+    with TemporaryDirectory() as d:
+        ps = [Pipeline(join(d,'%s_%d.cql'%(op.__name__.lower(),i)), op, src, tar,
+                       src_conn = Conn(db = 'source_%d'%i, user = 'bench', pw = 'bench'),
+                       tar_conn = Instance(), overlap = overlap)
+                for i in range(k) for op in ops]
+        for w in [1,workers]:
+            print('%d workers'%w)
+            print(batch(ps, workers = w)); print()
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
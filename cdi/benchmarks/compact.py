@@ -0,0 +1,50 @@
+# External
+from typing import List as L
+from re     import compile
+
+# Internal
+from cdi                      import Merge, Instance, Conn
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Size and render time of the science example merge file, normal vs. compact
+
+    python -m cdi.benchmarks.compact
+
+The compact file is checked to hold the same tokens as the normal one: words
+and punctuation, and string literals (whose whitespace alignment may change)
+with the same words.
+'''
+
+# A string literal, a comment or a word (a '"' left over is an unclosed literal)
+_token = compile(r'("(?:[^"\\]|\\.)*")|//[^\n]*|([^\s"]+)|(")')
+
+def tokens(text : str) -> L[str]:
+    '''Tokens of a CQL file, without comments'''
+    out = [] # type: L[str]
+    for m in _token.finditer(text):
+        lit,word,bad = m.groups()
+        if bad:
+            raise ValueError('unclosed string literal at %d: %r'%(m.start(),text[m.start():][:40]))
+        elif lit:  out.append(' '.join(lit.split()))
+        elif word: out.append(word)
+    return out
+
+def main() -> None:
+    from cdi.science_example.main import oqmd, rich, fOQMD, overlap, funcs
+    db = Conn(db = 'bench', user = 'bench', pw = 'bench')
+    m  = Merge(src = oqmd, tar = rich, overlap = overlap, filt1 = fOQMD, funcs = funcs)
+
+    def render(compact : bool) -> str:
+        return m.file(db, Instance(), db, compact = compact)
+
+    normal, small = render(False), render(True)
+    assert tokens(small) == tokens(normal), 'compact output differs'
+
+    t1,t2 = timed(lambda: render(False)), timed(lambda: render(True))
+    print('%-8s %8d bytes %6d lines  %.3fs'%('normal',len(normal),normal.count('\n')+1,t1))
+    print('%-8s %8d bytes %6d lines  %.3fs'%('compact',len(small),small.count('\n')+1,t2))
+    print('size x%.2f   time x%.2f'%(len(small)/len(normal),t2/t1))
+
+if __name__ == '__main__':
+    main()
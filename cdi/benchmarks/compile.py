@@ -0,0 +1,37 @@
+# External
+from sys import argv
+
+# Internal
+from cdi.core.utils           import compile_counter
+from cdi.core.exposed         import Schema, Overlap
+from cdi.core.cql             import Merge, Migrate
+from cdi.benchmarks.synthetic import synthetic, timed
+################################################################################
+'''
+Constructing a Migrate and a Merge from the same arguments, with and without
+compile-once caching of Schema.schema() and Overlap.overlap()
+
+    python -m cdi.benchmarks.compile [n_entities]
+'''
+
+def main(n : int = 1000) -> None:
+    src,tar,overlap = synthetic(n)
+    both = lambda: [cls(src = src, tar = tar, overlap = overlap) for cls in [Migrate,Merge]]
+    def cold() -> None:
+        for x in [src,tar,overlap]: vars(x).pop('_derived',None) # forget results
+        both()
+
+    compile_counter.clear()
+    cold()
+    print(compile_counter.report()); print()
+    c,w = timed(cold), timed(both)
+
+    cached = Schema.schema, Overlap.overlap
+    Schema.schema, Overlap.overlap = [f.__wrapped__ for f in cached] # type: ignore
+    try:     old = timed(both)
+    finally: Schema.schema, Overlap.overlap = cached # type: ignore
+    print('Migrate+Merge construction')
+    print('    uncached %.3fs   cached: cold %.3fs, warm %.4fs'%(old,c,w))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
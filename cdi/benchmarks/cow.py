@@ -0,0 +1,42 @@
+# External
+from typing     import Iterator
+from sys        import argv
+from copy       import deepcopy
+from contextlib import contextmanager
+
+# Internal
+from cdi.core.classes      import Schema
+from cdi.core.cql          import Merge, Migrate
+from cdi.benchmarks.synthetic import synthetic, timed, src_db
+from cdi                   import Instance
+################################################################################
+'''
+Copy-on-write Schema.copy vs. the old deepcopy
+
+    python -m cdi.benchmarks.cow [n_entities]
+'''
+
+@contextmanager
+def deep_copies() -> Iterator[None]:
+    '''Temporarily make Schema.copy a full deepcopy again'''
+    cow = Schema.copy
+    def copy(self : Schema) -> Schema:
+        new = deepcopy(self)
+        new._shared.clear()
+        return new
+    Schema.copy = copy # type: ignore
+    try:     yield
+    finally: Schema.copy = cow # type: ignore
+
+def main(n : int = 1000) -> None:
+    src,tar,overlap = synthetic(n)
+    for cls in [Merge,Migrate]:
+        c = cls(src = src, tar = tar, overlap = overlap)
+        f = lambda: c.sections(src_db, Instance(), None)
+        with deep_copies(): old = timed(f)
+        new = timed(f)
+        name = cls.__name__ + '.sections'
+        print('%-18s deepcopy %.3fs   copy-on-write %.3fs   (x%.1f)'%(name,old,new,old/new))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
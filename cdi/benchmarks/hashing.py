@@ -0,0 +1,70 @@
+# External
+from typing     import Any, Iterator
+from sys        import argv
+from contextlib import contextmanager
+
+# Internal
+from cdi.core.utils        import Base, Compact
+from cdi.core.cql          import Merge
+from cdi.core.primitives   import sql
+from cdi.benchmarks.synthetic import synthetic, timed, src_db
+from cdi                   import Instance
+################################################################################
+'''
+Structural hashing (cached on Compact nodes) vs. the old hash(str(vars(self)))
+
+    python -m cdi.benchmarks.hashing [n_entities]
+'''
+
+@contextmanager
+def legacy_hashing() -> Iterator[None]:
+    '''Temporarily restore the original (uncached, string-based) Base hashing'''
+    old = [(c, dict(vars(c))) for c in [Base, Compact]]
+
+    def __hash__(self : Base) -> int:
+        return hash(str(self._state()))
+
+    def __eq__(self : Base, other : Any) -> bool:
+        if type(other) == type(self): return self._state() == other._state()
+        else: raise ValueError(self,other)
+
+    for c,_ in old:
+        c.__hash__, c.__eq__ = __hash__, __eq__ # type: ignore
+    try:     yield
+    finally:
+        for c,attrs in old:
+            for k in ['__hash__','__eq__']:
+                if k in attrs: setattr(c, k, attrs[k])
+                else:          delattr(c, k)
+
+def main(n : int = 400) -> None:
+    src,tar,overlap = synthetic(n)
+    o  = overlap.overlap()
+    cs = o.s1.schema('s', sql)
+
+    def sets() -> None:
+        '''Rebuild sets of existing nodes, as Schema/Overlap/Query do'''
+        for _ in range(10):
+            set(o.patheqs); set(o.s1.entities.values()); set(cs.attrs)
+
+    def schemas() -> None:
+        '''Hash entire schemas (e.g. CQL schema imports)'''
+        for _ in range(10):
+            {cs, o.s1, o.s2}
+
+    def lookups() -> None:
+        '''Membership of freshly built paths in the overlap (Migrate._inter)'''
+        for e in o.s1.entities.values():
+            for a in e.attrs.values(): a.path() in o.patheqs
+
+    def merge() -> None:
+        Merge(src = src, tar = tar, overlap = overlap).file(src_db, Instance())
+
+    for name,f in [('sets',sets),('schemas',schemas),('lookups',lookups),
+                   ('Merge.file',merge)]:
+        with legacy_hashing(): old = timed(f)
+        new = timed(f)
+        print('%-12s legacy %.4fs   structural %.4fs   (x%.1f)'%(name,old,new,old/new))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
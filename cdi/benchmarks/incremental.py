@@ -0,0 +1,43 @@
+# External
+from sys       import argv
+from tempfile  import TemporaryDirectory
+from os.path   import join
+from time      import perf_counter
+
+# Internal
+from cdi.core.cache           import DiskCache
+from cdi.core.cql             import Merge
+from cdi.benchmarks.synthetic import synthetic, src_db
+from cdi                      import Conn, Literal, LT
+################################################################################
+'''
+Regenerating a file with a persistent section cache, after a change to the
+filter on one target entity (which only affects the landing of target data)
+
+    python -m cdi.benchmarks.incremental [n_entities]
+'''
+
+tar_db = Conn(db = 'synthetic_tar', user = 'bench', pw = 'bench')
+
+def main(n : int = 400) -> None:
+    src,tar,overlap = synthetic(n)
+    e      = tar['t%d'%(n//2)]
+    before = Merge(src = src, tar = tar, overlap = overlap)
+    after  = Merge(src = src, tar = tar, overlap = overlap,
+                   filt2 = {e : e['t_a1'] |LT| Literal(100)})
+
+    with TemporaryDirectory() as d:
+        out, cache = join(d,'merge.cql'), DiskCache(join(d,'cache'))
+        for label,m in [('cold',before),('rerun',before),('changed',after)]:
+            t0 = perf_counter()
+            w  = m.update(out, src_db, tar_db, cache = cache)
+            t  = perf_counter() - t0
+            print('%-8s %.3fs  %3d sections recomputed, %3d reused, %9d bytes rewritten'
+                    %(label,t,len(cache.recomputed),cache.reused,w))
+        print(); print(cache.report())
+
+        with open(out) as f: text = f.read()
+        assert text == after.file(src_db, tar_db)
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
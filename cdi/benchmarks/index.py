@@ -0,0 +1,54 @@
+# External
+from typing    import Any, List as L
+from sys       import argv
+from itertools import chain
+
+# Internal
+from cdi.core.classes         import Path, Schema as Schema_, FK, Attr
+from cdi.core.primitives      import Schema as CQLSchema, sql, merge_dicts
+from cdi.benchmarks.synthetic import synthetic, timed
+################################################################################
+'''
+Schema lookups by name vs. the original scans of the values of its dicts
+
+    python -m cdi.benchmarks.index [n_entities] [n_attrs]
+'''
+
+def legacy_exists_in(p : Path, schema : Schema_) -> bool:
+    for x in p.xs:
+        if isinstance(x,FK):
+            if x not in schema[x.src].fks.values(): return False
+        elif isinstance(x,Attr):
+            if x not in schema[x.obj].attrs.values(): return False
+    return True
+
+def legacy_rewrite_dict(s : CQLSchema, overlap : dict, left : CQLSchema) -> dict:
+    def all_entities(s : CQLSchema) -> dict:
+        return merge_dicts([s.entities] + [all_entities(i) for i in s.imports])
+    es,les = all_entities(s),all_entities(left)
+    return {k:(v,{a for a in chain(es[k].attrs,es[k].fks)
+                    if a in chain(les[v].attrs,les[v].fks)})
+                for k,v in overlap.items()}
+
+def row(name : str, old : float, new : float) -> None:
+    print('%-14s scan %.4fs   lookup %.4fs   (x%.1f)'%(name,old,new,old/new))
+
+def main(n : int = 2000, n_attrs : int = 20) -> None:
+    src,tar,overlap = synthetic(n,n_attrs)
+    s     = src.schema()
+    paths = [a.path() for e in s.entities.values() for a in e.attrs.values()] \
+          + [f.path() for e in s.entities.values() for f in e.fks.values()] # type: L[Any]
+    assert [p.exists_in(s) for p in paths] == [legacy_exists_in(p,s) for p in paths]
+    row('exists_in', timed(lambda: [legacy_exists_in(p,s) for p in paths]),
+                     timed(lambda: [p.exists_in(s) for p in paths]))
+
+    # the same entity names on both sides, as in Merge (src2 imports src)
+    left  = s.schema('src',sql)
+    right = CQLSchema('src2', 'sql', imports = [left])
+    ov    = {en:en for en in s.entities}
+    assert right.rewrite_dict(ov,left) == legacy_rewrite_dict(right,ov,left)
+    row('rewrite_dict', timed(lambda: legacy_rewrite_dict(right,ov,left)),
+                        timed(lambda: right.rewrite_dict(ov,left)))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,56 @@
+# External
+from typing  import Any, List as L
+from sys     import argv
+from random  import Random
+from sqlite3 import connect, Connection
+
+# Internal
+from cdi                      import Migrate, Instance, Schema
+from cdi.core.integrity       import check
+from cdi.core.primitives      import ChaseInstance
+from cdi.benchmarks.synthetic import generate, src_db, timed
+################################################################################
+'''
+The pre-flight FK integrity check on a SQLite stand-in of a chain schema (see
+synthetic.chain_schema), and the landing sections of Migrate with and without
+it: when no FK dangles, the chase and the sigma after it are skipped
+
+    python -m cdi.benchmarks.integrity [n_entities] [rows_per_entity] [n_dangling]
+'''
+
+def fixture(schema : Schema, n : int, dangling : int) -> Connection:
+    '''Every entity with n rows, all referring to existing parents but for a few'''
+    rand = Random(0)
+    conn = connect(':memory:')
+    for en,e in schema.entities.items():
+        cols = ['`%s` integer primary key'%e.idname] + ['`%s` text'%a for a in e.attrs] \
+             + ['`%s` integer'%f for f in e.fks]
+        conn.execute('CREATE TABLE `%s` (%s)'%(en, ', '.join(cols)))
+        rows = [[i] + ['%s%d'%(a,i) for a in e.attrs] + [rand.randrange(n) for _ in e.fks]
+                    for i in range(n)]
+        conn.executemany('INSERT INTO `%s` VALUES (%s)'%(en, ','.join('?' * len(rows[0]))), rows)
+    fk = [en for en,e in schema.entities.items() if e.fks]
+    for _ in range(dangling): # a missing parent, or none
+        en = rand.choice(fk)
+        conn.execute('UPDATE `%s` SET parent = ? WHERE rowid = ?'%en,
+                     (rand.choice([None, n + 1]), rand.randrange(n) + 1))
+    return conn
+
+def chased(sects : L[Any]) -> int:
+    return sum(isinstance(s,ChaseInstance) for s in sects)
+
+def main(n_ents : int = 50, n : int = 20000, dangling : int = 3) -> None:
+    src,tar,overlap = generate(n_ents, 3)
+    for bad in [dangling, 0]:
+        conn   = fixture(src, n, bad)
+        report = check(conn, src)
+        t      = timed(lambda: check(conn, src))
+        print('%d entities x %d rows, %d corrupted: %s (%.3fs)'%(n_ents, n, bad, report, t))
+
+        m      = Migrate(src = src, tar = tar, overlap = overlap, integrity1 = report)
+        sects  = m.sections(src_db, Instance(), None)
+        print('  Migrate: %d sections, %d chase instances'%(
+                len(sects), chased(sects)))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
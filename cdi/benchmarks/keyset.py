@@ -0,0 +1,41 @@
+# External
+from typing  import Any, List as L
+from sys     import argv
+from sqlite3 import connect, Connection
+
+# Internal
+from cdi                      import Entity
+from cdi.core.keyset          import bounds
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Finding the chunk boundaries of a large table on a SQLite stand-in: keyset
+pagination (seeking past the last boundary in the id index), compared to the
+usual LIMIT/OFFSET pagination, which rescans the table from the start for each
+chunk
+
+    python -m cdi.benchmarks.keyset [n_rows] [chunk_size]
+'''
+
+def offsets(conn : Connection, ent : Entity, size : int) -> L[Any]:
+    q   = 'SELECT "{0}" FROM "{1}" ORDER BY "{0}" LIMIT 1 OFFSET ?'.format(ent.idname, ent.name)
+    out = [] # type: L[Any]
+    row = conn.execute(q, (size,)).fetchone()
+    while row is not None:
+        out.append(row[0])
+        row = conn.execute(q, (size * (len(out) + 1),)).fetchone()
+    return out
+
+def main(n : int = 1000000, size : int = 20000) -> None:
+    conn  = connect(':memory:')
+    conn.execute('CREATE TABLE atoms (id integer primary key, x double)')
+    conn.executemany('INSERT INTO atoms VALUES (?,?)', ((3 * i, i / 7) for i in range(n)))
+    atoms = Entity('atoms', id = 'id')
+
+    assert bounds(conn, atoms, size) == offsets(conn, atoms, size)
+    k,o = timed(lambda: bounds(conn, atoms, size)), timed(lambda: offsets(conn, atoms, size))
+    print('%d rows in chunks of %d: %d import_jdbc instances'%(n, size, len(bounds(conn, atoms, size)) + 1))
+    print('keyset %.4fs   offset %.4fs'%(k, o))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,64 @@
+# External
+from typing             import List as L
+from sys                import argv
+from random             import Random
+from sqlite3            import connect
+from tempfile           import TemporaryDirectory
+from os.path            import join
+from time               import sleep
+from concurrent.futures import ThreadPoolExecutor
+
+# Internal
+from cdi                      import Entity
+from cdi.core.keyset          import rows, partition
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Landing entities of very different sizes from a SQLite file, one after another
+over a single connection (one import_jdbc), against one connection per group of
+entities, the groups balanced by numbers of records (keyset.partition) or not.
+Fetching each batch of rows waits for a simulated network transfer (in
+milliseconds per thousand rows), as SQLite itself has none.
+
+    python -m cdi.benchmarks.landing [n_entities] [n_groups] [ms_per_1000_rows]
+'''
+
+def fetch(path : str, ents : L[Entity], delay : float) -> int:
+    '''Land some entities over a fresh connection: the number of rows'''
+    conn,n = connect(path), 0
+    for e in ents:
+        cur = conn.execute('SELECT * FROM "%s"'%e.name)
+        for batch in iter(lambda: cur.fetchmany(1000), []):
+            sleep(delay * len(batch) / 1000)
+            n += len(batch)
+    conn.close()
+    return n
+
+def land(path : str, groups : L[L[Entity]], delay : float) -> int:
+    with ThreadPoolExecutor(len(groups)) as pool:
+        return sum(pool.map(lambda g: fetch(path, g, delay), groups))
+
+def main(n_ents : int = 20, n_groups : int = 4, ms : float = 2.) -> None:
+    rand = Random(0)
+    with TemporaryDirectory() as tmp:
+        path = join(tmp, 'src.db')
+        conn = connect(path)
+        ents = [Entity('t%d'%i, id = 'id') for i in range(n_ents)]
+        for e in ents: # a few large tables, many small ones
+            conn.execute('CREATE TABLE "%s" (id integer primary key, x double)'%e.name)
+            conn.executemany('INSERT INTO "%s" (x) VALUES (?)'%e.name,
+                             [(rand.random(),) for _ in range(int(1000 * rand.paretovariate(1.2)))])
+        conn.commit()
+
+        sizes    = rows(conn, ents)
+        balanced = partition(sizes, n_groups)
+        naive    = [ents[i::n_groups] for i in range(n_groups)]
+        total    = sum(sizes.values())
+        for label,groups in [('one import_jdbc',[ents]),('round robin',naive),('balanced',balanced)]:
+            largest = max(sum(sizes[e] for e in g) for g in groups)
+            t       = timed(lambda: land(path, groups, ms / 1000), 1)
+            print('%-16s %d groups, largest with %5.1f%% of %d rows: %.3fs'%(
+                    label, len(groups), 100 * largest / total, total, t))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,63 @@
+# External
+from typing     import Any, List as L, Tuple as T, Callable as C
+from sys        import argv
+from tracemalloc import start, stop, take_snapshot
+
+# Internal
+from cdi.core.utils        import Base
+from cdi.core              import classes, primitives
+from cdi.benchmarks.synthetic import synthetic
+################################################################################
+'''
+Memory footprint of the Compact (__slots__) node types, measured with
+tracemalloc on a synthetic schema of ~10k attributes
+
+    python -m cdi.benchmarks.memory [n_entities] [n_attrs]
+'''
+
+def loose(cls : type) -> type:
+    '''Equivalent of a Compact class which keeps its fields in a __dict__ (the
+       representation used before)'''
+    return type(cls.__name__, (Base,), {'__init__' : getattr(cls,'__init__'),
+                                        '__str__'  : cls.__str__})
+
+def measure(mk : C[[],L[Any]]) -> int:
+    '''Bytes allocated (and still live) while building a list of objects'''
+    start()
+    before = take_snapshot()
+    objs   = mk()
+    diff   = take_snapshot().compare_to(before, 'filename')
+    stop()
+    del objs
+    return sum(d.size_diff for d in diff)
+
+def main(n : int = 2000, m : int = 5) -> None:
+    src,tar,_ = synthetic(n, m)
+    s       = src.schema()
+    attrs   = [a for e in s.entities.values() for a in e.attrs.values()]
+    fks     = [f for e in s.entities.values() for f in e.fks.values()]
+
+    # Constructor arguments for the ~10k of each node type the schema produces
+    args = [
+        (classes.Attr,    [(a.name,a.obj,a.dtype,a.id)     for a in attrs]),
+        (classes.FK,      [(f.name,f.src,f.tar,f.id)        for f in fks]),
+        (classes.Gen,     [(e.name,e) for e in s.entities.values()]),
+        (primitives.Attr, [(a.name,a.obj,a.dtype.name)      for a in attrs]),
+        (primitives.FK,   [(f.name,f.src,f.tar)             for f in fks]),
+        (primitives.Type, [(a.dtype.name,)                  for a in attrs]),
+        (primitives.Gen,  [(a.obj,a.obj)                    for a in attrs]),
+        (primitives.JLit, [(a.name,a.dtype.name)            for a in attrs]),
+        (primitives.GenAttr,[(a.name,a.dtype.name,primitives.Gen(a.obj,a.obj))
+                                                            for a in attrs]),
+        ] # type: L[T[type,L[tuple]]]
+
+    print('%-22s %8s %10s %10s'%('node','count','dict B/obj','slots B/obj'))
+    for cls,xs in args:
+        dcls = loose(cls)
+        old  = measure(lambda: [dcls(*x) for x in xs])
+        new  = measure(lambda: [cls(*x)  for x in xs])
+        name = cls.__module__.split('.')[-1] + '.' + cls.__name__
+        print('%-22s %8d %10.0f %10.0f'%(name,len(xs),old/len(xs),new/len(xs)))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,98 @@
+# External
+from typing  import Any, List as L, Dict as D
+from sys     import argv
+from json    import dumps
+from random  import Random
+from sqlite3 import connect, Connection
+
+# Internal
+from cdi                      import (SQLExpr, REPLACE, JSON_EXTRACT, Sum, AND, GT, ABS,
+                                      SUBSELECT, GROUP_CONCAT, MAX)
+from cdi.core.classes         import Ref
+from cdi.core.expr            import Literal
+from cdi.core.optimize        import simplify, hoist
+from cdi.benchmarks.synthetic import timed
+from cdi.benchmarks           import unnest
+################################################################################
+'''
+Landing expressions as the science example writes them (readJSON's REPLACE
+chain repeated for every JSON key, Sum's leading 0, nested ANDs) against their
+simplified form, with the repeated REPLACE chain computed once per record in a
+derived table, on a SQLite fixture: the results must be identical. Also, that
+what subselects share is not hoisted, as it belongs to another table
+
+    python -m cdi.benchmarks.optimize [n_calculations] [n_keys]
+'''
+
+def show(x : Any) -> str:
+    '''Plain SQL (Land.makeSQL additionally escapes for CQL strings)'''
+    if   isinstance(x,Ref):     return '`%s`'%x.attr
+    elif isinstance(x,Literal): return "'%s'"%x.x.replace("'","''") if isinstance(x.x,str) \
+                                    else '(%s)'%x.x
+    elif isinstance(x,SQLExpr): return x.show(show)
+    raise TypeError(x)
+
+def fixture(n : int, keys : L[str]) -> Connection:
+    '''Calculations with settings written as Python dicts (as in OQMD)'''
+    rand = Random(0)
+    conn = connect(':memory:')
+    conn.execute('CREATE TABLE calculations (id integer primary key, settings text, '
+                 'x1 double, x2 double, x3 double)')
+    rows = [(i, repr({k : rand.choice([True, False, rand.random(), 'a%d'%i]) for k in keys}),
+             rand.random(), rand.random(), rand.random()) for i in range(n)]
+    conn.executemany('INSERT INTO calculations VALUES (?,?,?,?,?)', rows)
+    return conn
+
+def query(table : str, exprs : L[SQLExpr], where : SQLExpr, optimized : bool) -> str:
+    src = table
+    if optimized:
+        exprs,hoisted = hoist(table, simplify(exprs))
+        where         = simplify(where)
+        if hoisted:
+            # LIMIT -1 OFFSET 0 keeps SQLite from flattening the derived
+            # table, as the LIMIT does for MySQL in Land.makeSQL
+            hs    = ''.join(', %s AS `%s`'%(show(x),c) for c,x in hoisted.items())
+            src   = '(SELECT %s.*%s FROM %s WHERE %s LIMIT -1 OFFSET 0) AS %s'%(
+                        table, hs, table, show(where), table)
+            where = Literal(1)
+    cols = ', '.join(show(e) for e in exprs)
+    return 'SELECT %s.id, %s FROM %s WHERE %s ORDER BY %s.id'%(
+                table, cols, src, show(where), table)
+
+def main(n : int = 50000, k : int = 6) -> None:
+    keys  = ['key%d'%i for i in range(k)]
+    conn  = fixture(n, keys)
+    c     = lambda x: Ref('calculations', x)
+
+    def readJSON(key : str) -> SQLExpr:
+        e = c('settings') # type: SQLExpr
+        for a,b in {'True':'true', 'False':'false', "'":'"'}.items():
+            e = REPLACE(e, Literal(a), Literal(b))
+        return JSON_EXTRACT(e, Literal('$.%s'%key))
+
+    exprs = [readJSON(key) for key in keys] \
+          + [Sum([c('x%d'%i) ** Literal(2) for i in range(1,4)]) ** Literal(0.5)]
+    where = AND(AND(GT(c('x1'), Literal(0)), Literal(1)), GT(c('x2'), Literal(0)))
+
+    q1,q2 = query('calculations', exprs, where, False), query('calculations', exprs, where, True)
+    assert conn.execute(q1).fetchall() == conn.execute(q2).fetchall(), 'rewrite changed the result'
+    t1,t2 = timed(lambda: conn.execute(q1).fetchall()), timed(lambda: conn.execute(q2).fetchall())
+    print('%d records, %d JSON keys: as written %.3fs   optimized %.3fs (same rows)'%(n, k, t1, t2))
+    print('SQL length: %d -> %d characters'%(len(q1), len(q2)))
+
+    # The same expression over atoms in two subselects, next to a repeated
+    # one over structures (which is hoisted)
+    conn  = unnest.fixture(n // 10, 10)
+    a,s   = (lambda x: Ref('atoms', x)), (lambda x: Ref('structures', x))
+    corr  = dict(tab = 'atoms', where = 'structure_id = structures.id')
+    both  = a('element_id') + a('x')
+    exprs = [SUBSELECT(GROUP_CONCAT(both), **corr), SUBSELECT(MAX(both), **corr),
+             ABS(s('id') - Literal(5)) * Literal(2), ABS(s('id') - Literal(5)) + Literal(1)]
+    _,hoisted = hoist('structures', exprs)
+    assert list(map(str,hoisted.values())) == [str(ABS(s('id') - Literal(5)))], hoisted
+    q1,q2 = [query('structures', exprs, Literal(1), o) for o in [False, True]]
+    assert conn.execute(q1).fetchall() == conn.execute(q2).fetchall(), 'rewrite changed the result'
+    print('subselects sharing an expression: only the outer one is hoisted (same rows)')
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,33 @@
+# External
+from sys import argv
+
+# Internal
+from cdi.core.classes         import Overlap
+from cdi.benchmarks.synthetic import synthetic, timed
+################################################################################
+'''
+Constructing a classes.Overlap with lazily derived structures, compared to
+building all of them up front (as __init__ used to)
+
+    python -m cdi.benchmarks.overlap [n_path_equations]
+'''
+
+def main(n : int = 5000) -> None:
+    src,tar,overlap = synthetic(n // 5, 5) # n attribute path equations, plus FKs
+    o   = overlap.overlap()
+    new = lambda: Overlap(o.s1, o.s2, o.pes, o.sa1, o.na1, list(o.ne1.values()),
+                          o.nf1, o.sa2, o.na2, list(o.ne2.values()), o.nf2)
+    def eager() -> Overlap:
+        x = new()
+        x.validate(); x.patheqs; x.entities; x.patheqs_simple
+        return x
+
+    print('%d path equations'%len(o.pes))
+    lazy,full = timed(new), timed(eager)
+    x = eager()
+    warm = timed(lambda: [x.patheqs, x.entities, x.patheqs_simple])
+    print('construct only %.4fs   construct + everything %.4fs   (x%.0f)'%(lazy,full,full/lazy))
+    print('later uses     %.6fs'%warm)
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,32 @@
+# External
+from sys  import argv
+from time import perf_counter
+from os   import cpu_count
+
+# Internal
+from cdi.core.cql             import Merge, Migrate
+from cdi.benchmarks.synthetic import synthetic, src_db
+from cdi                      import Instance
+################################################################################
+'''
+Rendering sections serially vs. with a pool of 2, 4 and 8 worker processes
+
+    python -m cdi.benchmarks.parallel [n_entities]
+'''
+
+def main(n : int = 2000) -> None:
+    src,tar,overlap = synthetic(n)
+    print('%d cpus'%(cpu_count() or 1))
+    for cls in [Migrate,Merge]:
+        c      = cls(src = src, tar = tar, overlap = overlap)
+        serial = None
+        for w in [1,2,4,8]:
+            t0  = perf_counter()
+            out = c.file(src_db, Instance(), workers = w)
+            t   = perf_counter() - t0
+            serial = serial or (out,t)
+            assert out == serial[0], 'output differs with %d workers'%w
+            print('%-8s %d workers  %.3fs  (x%.2f)'%(cls.__name__,w,t,serial[1]/t))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
@@ -0,0 +1,37 @@
+# External
+from sys import argv
+
+# Internal
+from cdi                      import Migrate, Merge, Instance, Conn
+from cdi.core.utils           import profiling
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Stage-level profile of generating the science example files (JSON report), and
+the cost of profiling when it is on and off
+
+    python -m cdi.benchmarks.profile [report.json]
+'''
+
+def main(path : str = '') -> None:
+    from cdi.science_example.main import oqmd, rich, fOQMD, overlap, funcs
+    db   = Conn(db = 'bench', user = 'bench', pw = 'bench')
+    def run() -> None:
+        for x in [oqmd,rich,overlap]: vars(x).pop('_derived',None) # recompile
+        for cls in [Migrate,Merge]:
+            c = cls(src = oqmd, tar = rich, overlap = overlap, filt1 = fOQMD, funcs = funcs)
+            c.file(db, Instance(), db)
+
+    with profiling() as p: run()
+    if path:
+        with open(path,'w') as f: f.write(p.json())
+    else:
+        print(p.json())
+
+    def profiled() -> None:
+        with profiling(): run()
+    off,on = timed(run), timed(profiled)
+    print('profiling off %.3fs   on %.3fs'%(off,on))
+
+if __name__ == '__main__':
+    main(*argv[1:])
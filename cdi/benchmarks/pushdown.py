@@ -0,0 +1,40 @@
+# External
+from typing import Any
+
+# Internal
+from cdi                      import Migrate, Instance, Conn
+from cdi.core.primitives      import LandInstance
+from cdi.benchmarks.synthetic import generate, timed, src_db
+################################################################################
+'''
+Projection pushdown in Migrate: landed entities and columns, and size of the
+import_jdbc sections, with and without it
+
+    python -m cdi.benchmarks.pushdown
+'''
+
+def landed(m : Migrate, src : Any) -> str:
+    '''Number of landed entities/columns and size of the import_jdbc sections'''
+    lands = [s for s in m.sections(src, Instance(), None) if isinstance(s, LandInstance)]
+    ents  = [e for l in lands for e in l.ents]
+    cols  = sum(len(e.attrs) for e in ents)
+    chars = sum(len(l.show()) for l in lands)
+    return '%4d entities %5d columns %8d chars'%(len(ents), cols, chars)
+
+def compare(name : str, m : Migrate, src : Any) -> None:
+    for pushdown in [False, True]:
+        m.pushdown = pushdown
+        t = timed(lambda: m.file(src, Instance()))
+        print('%-26s pushdown %-5s %s   file() %.3fs'%(name, pushdown, landed(m, src), t))
+
+def main() -> None:
+    from cdi.science_example.main import oqmd, rich, fOQMD, overlap, funcs
+    db = Conn(db = 'bench', user = 'bench', pw = 'bench')
+    compare('science example', Migrate(src = oqmd, tar = rich, overlap = overlap,
+                                       filt1 = fOQMD, funcs = funcs), db)
+
+    src,tar,o = generate(400, 10, fk_depth = 4, overlap = .25)
+    compare('synthetic, 25% overlap', Migrate(src = src, tar = tar, overlap = o), src_db)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# External
+from typing   import Any, List as L
+from sys      import argv
+from sqlite3  import connect, Connection
+from tempfile import TemporaryDirectory
+from os.path  import join
+from time     import sleep
+
+# Internal
+from cdi.core.reflect         import Catalog, catalog, reflect
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Reflecting the schema of a SQLite database with many tables: one catalog query
+per table (and kind of metadata), compared to the bulk queries of
+reflect.sqlite_catalog, and to a reflection cached on disk. Each query is delayed by a simulated
+network round trip (in milliseconds), as SQLite itself has none.
+
+    python -m cdi.benchmarks.reflect [n_tables] [n_columns] [round_trip_ms]
+'''
+
+class Remote(Connection):
+    '''A SQLite connection whose queries each take an extra round trip'''
+    rtt = 0.
+
+    def execute(self, *args : Any) -> Any:
+        sleep(self.rtt)
+        return super().execute(*args)
+
+def fixture(path : str, n_tables : int, n_cols : int) -> Connection:
+    '''Chain of tables, each with a FK to the previous one and a unique key'''
+    conn = connect(path)
+    for i in range(n_tables):
+        cols = ['c%d %s'%(j, ['varchar(40)','double','int'][j % 3]) for j in range(n_cols)]
+        fk   = ['p int references t%d(id)'%(i-1)] if i else []
+        conn.execute('CREATE TABLE t%d (id integer primary key, %s, unique(c0))'
+                        %(i, ', '.join(cols + fk)))
+    conn.commit()
+    return conn
+
+def per_table(conn : Connection) -> Catalog:
+    '''What reflection costs when every table is queried separately'''
+    names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    cols,fks,keys = [], [], [] # type: L[Any],L[Any],L[Any]
+    for t in names:
+        cols.extend((t,c,ty,pk) for _,c,ty,_,_,pk in conn.execute('PRAGMA table_info(%s)'%t))
+        fks.extend((t,i,c,r) for i,_,r,c,*_ in conn.execute('PRAGMA foreign_key_list(%s)'%t))
+        for _,ix,u,o,_ in conn.execute('PRAGMA index_list(%s)'%t):
+            if u and o != 'pk':
+                keys.extend((t,ix,c) for _,_,c in conn.execute('PRAGMA index_info(%s)'%ix))
+    return Catalog(cols,fks,keys)
+
+def main(n_tables : int = 500, n_cols : int = 20, rtt : float = 1.) -> None:
+    with TemporaryDirectory() as d:
+        fixture(join(d,'db.sqlite'), n_tables, n_cols).close()
+        Remote.rtt = rtt / 1000
+        conn = connect(join(d,'db.sqlite'), factory = Remote)
+
+        a,b = per_table(conn), catalog(conn)
+        assert a.schema('s') == b.schema('s')
+
+        reflect(conn, 's', cache = join(d,'cache')) # populate the cache
+        slow = timed(lambda: per_table(conn).schema('s'))
+        bulk = timed(lambda: reflect(conn, 's'))
+        hit  = timed(lambda: reflect(conn, 's', cache = join(d,'cache')))
+        print('%d tables x %d columns, %gms round trips'%(n_tables, n_cols, rtt))
+        print('per table queries %.3fs   bulk queries %.3fs   cached %.3fs'%(slow,bulk,hit))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:3]), *map(float,argv[3:]))
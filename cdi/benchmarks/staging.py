@@ -0,0 +1,96 @@
+# External
+from typing  import List as L
+from sys     import argv
+
+# Internal
+from cdi                      import SQLExpr, REPLACE, JSON_EXTRACT, GT, Entity, Attr, Double, Text
+from cdi.core.classes         import Ref, Land, LandObj, Schema, Attr as Attr_
+from cdi.core.expr            import Literal
+from cdi.core.reflect         import content_fingerprint
+from cdi.core.utils           import Conn
+from cdi.benchmarks.optimize  import fixture
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Landing computed columns (readJSON over the REPLACE chain, as in the science
+example) by computing them in every landing query, against materializing them
+once into an indexed staging table which later landings join, on a SQLite
+fixture: the results must be identical. The queries and commands are those of
+Land.execs and Land.makeSQL (translated for SQLite, see sqlite). Also, that the
+staging table changes with the content of the database
+
+    python -m cdi.benchmarks.staging [n_calculations] [n_keys] [n_landings]
+'''
+
+def sqlite(sql : str) -> str:
+    '''
+    What CQL would send for a string of the file (escaped for it, see
+    Land.makeSQL), in SQLite's dialect: no key in CREATE TABLE .. AS (the
+    staging table gets a unique index instead), no unsigned LIMIT
+    '''
+    sql = sql.strip().strip('"').replace('\\"','"').replace('%%','%')
+    sql = sql.replace(' (PRIMARY KEY (`_id`)) AS ', ' AS ')
+    return sql.replace('LIMIT 18446744073709551615', 'LIMIT -1')
+
+def main(n : int = 50000, k : int = 6, runs : int = 3) -> None:
+    keys  = ['key%d'%i for i in range(k)]
+    conn  = fixture(n, keys)
+    conn.create_function('CONVERT', 2, lambda x,_: None if x is None else str(x))
+    c     = lambda x: Ref('calculations', x)
+
+    def readJSON(key : str) -> SQLExpr:
+        e = c('settings') # type: SQLExpr
+        for a,b in {'True':'true', 'False':'false', "'":'"'}.items():
+            e = REPLACE(e, Literal(a), Literal(b))
+        return JSON_EXTRACT(e, Literal('$.%s'%key))
+
+    e      = Entity('calculations', id = 'id',
+                    attrs = [Attr('settings',Text)] + [Attr('x%d'%i,Double) for i in range(1,4)]).ent()
+    lo     = LandObj(e, {Attr_(key,e.name,Text.type(),False) : readJSON(key) for key in keys},
+                     GT(c('x1'), Literal(0.1)))
+    schema = Schema('src', [e])
+    db     = Conn(db = 'bench', user = 'bench', pw = 'bench')
+
+    def staging(fp : str) -> Land:
+        return Land(schema, [lo], staging = fp)
+
+    def create(land : Land) -> str:
+        '''Run the commands of a land, and index its staging table: the table'''
+        for x in land.execs('src', db):
+            for q in [x.sql] if isinstance(x.sql,str) else x.sql: conn.execute(sqlite(q))
+        staged = land.staging_query(e, lo)
+        assert staged, 'nothing to stage'
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS `%s_id` ON `%s` (`_id`)'%(staged[0],staged[0]))
+        return staged[0]
+
+    def recreate(land : Land) -> None:
+        conn.execute('DROP TABLE IF EXISTS `%s`'%create(land))
+        create(land)
+
+    t_fp   = timed(lambda: content_fingerprint(conn))
+    land   = staging(content_fingerprint(conn))
+    table  = create(land)
+    direct = sqlite(Land(schema, [lo])._sql(e, lo))
+    staged = sqlite(land._sql(e, lo))
+    assert sorted(conn.execute(direct)) == sorted(conn.execute(staged)), \
+        'staging changed the result'
+
+    t_direct = timed(lambda: conn.execute(direct).fetchall())
+    t_create = timed(lambda: recreate(land))
+    t_staged = timed(lambda: conn.execute(staged).fetchall())
+
+    # Editing a record changes the fingerprint, hence the table: no stale rows
+    conn.execute("UPDATE calculations SET settings = '{}' WHERE id = (SELECT MIN(_id) FROM `%s`)"%table)
+    edited = staging(content_fingerprint(conn))
+    assert create(edited) != table, 'the staging table outlived a change of the data'
+    assert sorted(conn.execute(direct)) == sorted(conn.execute(sqlite(edited._sql(e, lo)))), \
+        'staging returned stale rows'
+
+    print('%d records, %d JSON keys, %d landings:'%(n, k, runs))
+    print('  computed every time  %.3fs'%(runs * t_direct))
+    print('  staged               %.3fs (fingerprint %.3fs, create %.3fs, then %.3fs per landing)'%(
+            t_fp + t_create + runs * t_staged, t_fp, t_create, t_staged))
+    print('  staged, rerun        %.3fs (same content: the table exists)'%(t_fp + runs * t_staged))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
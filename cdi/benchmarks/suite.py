@@ -0,0 +1,106 @@
+# External
+from typing   import Any, Dict as D, List as L, Tuple as T, Type as Ty
+from argparse import ArgumentParser
+from json     import dumps, load
+from sys      import exit
+from gc       import collect
+
+# Internal
+from cdi                      import Migrate, Merge, Instance
+from cdi.core.cql             import CQL
+from cdi.core.exposed         import Schema as UserSchema, Overlap as UserOverlap
+from cdi.core.utils           import profiling
+from cdi.benchmarks.synthetic import generate, timed, src_db
+################################################################################
+'''
+Benchmark suite: end-to-end and per stage timings of Migrate.file and Merge.file
+on synthetic workloads of various shapes, compared against stored baselines
+
+    python -m cdi.benchmarks.suite [baseline.json] [--save] [--threshold 0.2]
+
+Without --save, timings more than `threshold` (relative) slower than those of
+the baseline are reported as regressions, and the exit status is 1.
+'''
+
+# name -> arguments of synthetic.generate
+configs = {
+    'small'    : dict(n_ents = 20,  n_attrs = 5),
+    'wide'     : dict(n_ents = 50,  n_attrs = 40),
+    'many'     : dict(n_ents = 400, n_attrs = 5),
+    'forest'   : dict(n_ents = 400, n_attrs = 5, fk_depth = 3),
+    'partial'  : dict(n_ents = 400, n_attrs = 5, overlap = .25),
+    'derived'  : dict(n_ents = 100, n_attrs = 5, n_new_attrs = 100, n_new_ents = 20),
+} # type: D[str,D[str,Any]]
+
+ops = [Migrate, Merge] # type: L[Ty[CQL]]
+
+# Slowdowns of less than this many seconds are never flagged (timer noise)
+noise = 0.01
+
+def run(workload : T[UserSchema,UserSchema,UserOverlap], op : Ty[CQL]) -> None:
+    '''Generate one file from scratch (nothing compiled or rendered before)'''
+    src,tar,overlap = workload
+    for x in workload: vars(x).pop('_derived',None)
+    collect() # not the garbage of the previous run
+    op(src = src, tar = tar, overlap = overlap).file(src_db, Instance(), src_db)
+
+def measure(reps : int = 3) -> D[str,D[str,Any]]:
+    '''{config/op : {'total' : seconds, 'stages' : {stage : seconds}}}'''
+    out = {} # type: D[str,D[str,Any]]
+    for name,config in configs.items():
+        workload = generate(**config)
+        for op in ops:
+            total  = timed(lambda: run(workload,op), reps)
+            stages = {} # type: D[str,float]
+            for _ in range(reps): # best of each stage, like timed()
+                with profiling() as p: run(workload,op)
+                for k,v in p.stages.items():
+                    stages[k] = min(stages.get(k,v[1]),v[1])
+            stages = {k:round(v,6) for k,v in sorted(stages.items())}
+            out['%s/%s'%(name,op.__name__)] = dict(total = round(total,6), stages = stages)
+    return out
+
+def regressions(base : D[str,D[str,Any]], new : D[str,D[str,Any]],
+                threshold : float) -> L[str]:
+    '''Timings which are slower than in the baseline by more than threshold'''
+    out = [] # type: L[str]
+    def check(label : str, b : float, n : float) -> None:
+        if n - b > noise and n > b * (1 + threshold):
+            out.append('%-40s %8.3fs -> %8.3fs (%+.0f%%)'%(label, b, n, 100*(n/b-1)))
+
+    for key,res in sorted(new.items()):
+        if key not in base: continue
+        check(key, base[key]['total'], res['total'])
+        for stage,t in sorted(res['stages'].items()):
+            if stage in base[key]['stages']:
+                check(key + ' ' + stage, base[key]['stages'][stage], t)
+    return out
+
+def main() -> None:
+    parser = ArgumentParser(description = 'Merge/Migrate benchmark suite')
+    parser.add_argument('baseline', nargs = '?', default = '')
+    parser.add_argument('--save', action = 'store_true',
+                        help = 'store these timings as the baseline')
+    parser.add_argument('--threshold', type = float, default = .2)
+    parser.add_argument('--reps', type = int, default = 5)
+    args = parser.parse_args()
+
+    new = measure(args.reps)
+    for key,res in new.items():
+        print('%-20s %8.3fs'%(key,res['total']))
+
+    if args.save or not args.baseline:
+        if args.baseline:
+            with open(args.baseline,'w') as f: f.write(dumps(new, indent = 2))
+        return
+
+    with open(args.baseline) as f: base = load(f)
+    slow = regressions(base, new, args.threshold)
+    if slow:
+        print('\n%d regressions (> %.0f%% slower than %s):'%(len(slow),100*args.threshold,args.baseline))
+        print('\n'.join(slow))
+        exit(1)
+    print('\nno regressions (threshold %.0f%%)'%(100*args.threshold))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# External
+from typing import (Any, List as L, Tuple as T, Callable as C,
+                    Optional as O)
+from time   import perf_counter
+
+# Internal
+from cdi import (Schema, Entity, Attr, FK, PathEQ, Path, Overlap, Varchar, Conn,
+                 Instance, Gen, NewAttr, NewEntity)
+################################################################################
+'''
+Synthetic workloads, much larger than the examples, for benchmarking Merge and
+Migrate.
+'''
+
+src_db = Conn(db = 'synthetic_src', user = 'bench', pw = 'bench')
+
+def chain_schema(name : str, n_ents : int, n_attrs : int,
+                 fk_depth : O[int] = None) -> Schema:
+    '''Entities <name>0 ... <name>N, each with M attributes and a FK to the
+       previous entity. With a fk_depth, the entities form separate chains of
+       at most that many FKs (none if it is 0)'''
+    ents = [] # type: L[Entity]
+    for i in range(n_ents):
+        parent = i > 0 if fk_depth is None else i % (fk_depth + 1) > 0
+        ents.append(Entity(
+            name  = '%s%d'%(name,i),
+            id    = 'id',
+            attrs = [Attr('%s_a%d'%(name,j), Varchar, id = (j == 0))
+                        for j in range(n_attrs)],
+            fks   = [FK('parent', '%s%d'%(name,i-1))] if parent else []))
+    return Schema(name, ents)
+
+def synthetic(n_ents : int = 400, n_attrs : int = 5) -> T[Schema,Schema,Overlap]:
+    '''Two isomorphic chain schemas with every column in the overlap'''
+    return generate(n_ents, n_attrs)
+
+def generate(n_ents      : int   = 400,
+             n_attrs     : int   = 5,
+             fk_depth    : O[int] = None,
+             overlap     : float = 1.,
+             n_new_attrs : int   = 0,
+             n_new_ents  : int   = 0
+            ) -> T[Schema,Schema,Overlap]:
+    '''
+    Two isomorphic chain schemas (see chain_schema) and an overlap between them
+
+    overlap     - fraction of the entities whose columns and FK are equated
+    n_new_attrs - NewAttrs on source entities (round robin), each copying the
+                  first attribute, and equated with an extra target attribute
+    n_new_ents  - NewEntities, each generated by a source entity (round robin)
+                  and equal to an extra target entity
+    '''
+    src = chain_schema('s', n_ents, n_attrs, fk_depth)
+    tar = chain_schema('t', n_ents, n_attrs, fk_depth)
+
+    n_eq  = round(overlap * n_ents)
+    paths = [] # type: L[PathEQ]
+    for i in range(n_eq):
+        s,t = src['s%d'%i], tar['t%d'%i]
+        paths.extend(PathEQ(Path(s['s_a%d'%j]),Path(t['t_a%d'%j]))
+                        for j in range(n_attrs))
+        if s.fks:
+            paths.append(PathEQ(Path(s['parent']),Path(t['parent'])))
+
+    # The targets of new attributes/entities are added under the same names
+    gens = [Gen('g%d'%i, src['s%d'%i]) for i in range(n_ents)]
+    new_attrs,new_ents = [], [] # type: T[L[NewAttr],L[NewEntity]]
+    for k in range(n_new_attrs):
+        i = k % n_ents
+        new_attrs.append(NewAttr(src['s%d'%i], 'new%d'%k, Varchar, gens[i]['s_a0']))
+        tar['t%d'%i].attrs['new%d'%k] = Attr('new%d'%k, Varchar)
+    for k in range(n_new_ents):
+        i,a = k % n_ents, Attr('x', Varchar, id = True)
+        new_ents.append(NewEntity(name  = 'New%d'%k, gens = [gens[i]],
+                                  attrs = {a : gens[i]['s_a0']}))
+    tar = Schema('t', list(tar.entities.values()) +
+                      [Entity('New%d'%k, attrs = [Attr('x', Varchar, id = True)])
+                        for k in range(n_new_ents)])
+
+    return src, tar, Overlap(s1 = src, s2 = tar, paths = paths,
+                             new_attr1 = new_attrs, new_ent1 = new_ents)
+
+def timed(f : C[[],Any], reps : int = 3) -> float:
+    '''Best wall time (seconds) over several repetitions of a thunk'''
+    best = float('inf')
+    for _ in range(reps):
+        t0   = perf_counter()
+        f()
+        best = min(best, perf_counter() - t0)
+    return best
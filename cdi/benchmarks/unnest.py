@@ -0,0 +1,88 @@
+# External
+from typing  import Any, List as L, Tuple as T
+from sys     import argv
+from random  import Random
+from sqlite3 import connect, Connection
+
+# Internal
+from cdi                      import GROUP_CONCAT, SUBSELECT, MIN, COUNT, SQLExpr
+from cdi.core.classes         import Ref
+from cdi.core.expr            import Literal
+from cdi.core.optimize        import unnest
+from cdi.benchmarks.synthetic import timed
+################################################################################
+'''
+Correlated aggregate subselects (as in the science example's structures and
+atoms) against their rewrite into a join with one grouped scan, on a SQLite
+fixture: the results must be identical. Then the same for the structures of a
+single chunk (as landed with keyset pagination), whose join only aggregates the
+atoms of that chunk, against a join which aggregates all of them
+
+    python -m cdi.benchmarks.unnest [n_structures] [atoms_per_structure]
+'''
+
+def show(x : Any) -> str:
+    '''Plain SQL (Land.makeSQL additionally escapes for CQL strings)'''
+    if   isinstance(x,Ref):     return '`%s`'%x.attr
+    elif isinstance(x,SQLExpr): return x.show(show)
+    raise TypeError(x)
+
+def fixture(n : int, k : int) -> Connection:
+    '''Structures with up to 2k atoms each (a tenth of them with none)'''
+    rand = Random(0)
+    conn = connect(':memory:')
+    conn.execute('CREATE TABLE structures (id integer primary key, natoms int)')
+    conn.execute('CREATE TABLE atoms (id integer primary key, structure_id int, element_id int, x double)')
+    conn.execute('CREATE INDEX atoms_structure ON atoms (structure_id)')
+    conn.executemany('INSERT INTO structures VALUES (?,?)', [(i,0) for i in range(n)])
+    atoms = [(s, rand.randrange(1,90), rand.random()) for s in range(n) if s % 10
+                for _ in range(rand.randrange(1, 2 * k))]
+    conn.executemany('INSERT INTO atoms (structure_id,element_id,x) VALUES (?,?,?)', atoms)
+    return conn
+
+def query(table : str, exprs : L[SQLExpr], rewrite : bool,
+          chunk : T[Any,Any] = (None,None), restrict : bool = True) -> str:
+    '''Query of the records of a chunk (joins aggregate all records unless `restrict`)'''
+    joins = [] # type: L[Any]
+    if rewrite: exprs,joins = unnest(table, exprs, chunk if restrict else (None,None))
+    cols  = ', '.join(show(e) for e in exprs)
+    lower,upper = chunk
+    where = ([] if lower is None else ['%s.id >= %d'%(table,lower)]) \
+          + ([] if upper is None else ['%s.id < %d'%(table,upper)])
+    return 'SELECT %s.id, %s FROM %s %s WHERE %s ORDER BY %s.id'%(
+                table, cols, table, ' '.join(j.show(show) for j in joins),
+                ' AND '.join(where) or '1', table)
+
+def rows(conn : Connection, q : str) -> L[Any]:
+    '''Result rows, with the (unordered) items of concatenations sorted'''
+    return [tuple(','.join(sorted(v.split(','))) if isinstance(v,str) else v for v in r)
+                for r in conn.execute(q)]
+
+def main(n : int = 20000, k : int = 10) -> None:
+    conn   = fixture(n, k)
+    a      = lambda x: Ref('atoms', x)
+    corr   = dict(tab = 'atoms', where = 'structure_id = structures.id')
+    structures = [SUBSELECT(GROUP_CONCAT(a('element_id')), **corr),
+                  SUBSELECT(GROUP_CONCAT(a('x')), **corr),
+                  SUBSELECT(COUNT(a('id')), **corr) + Literal(1)]
+    atoms  = [a('id') - SUBSELECT(MIN(a('id')), tab = 'atoms A',
+                                  where = 'A.structure_id=atoms.structure_id')] # type: L[SQLExpr]
+
+    cases = [('structures',structures),('atoms',atoms)] # type: L[T[str,L[SQLExpr]]]
+    for table,exprs in cases:
+        q1,q2 = query(table, exprs, False), query(table, exprs, True)
+        assert rows(conn, q1) == rows(conn, q2), 'rewrite changed the result'
+        t1,t2 = timed(lambda: conn.execute(q1).fetchall()), timed(lambda: conn.execute(q2).fetchall())
+        print('%-10s %d subselects: correlated %.3fs   join + GROUP BY %.3fs (same rows)'%(
+                table, len(exprs), t1, t2))
+
+    chunk    = (n//2, n//2 + n//20) # a twentieth of the structures
+    q1,q2,q3 = [query('structures', structures, rewrite, chunk, restrict)
+                    for rewrite,restrict in [(False,True),(True,True),(True,False)]]
+    assert rows(conn, q1) == rows(conn, q2) == rows(conn, q3), 'rewrite changed the result'
+    t1,t2,t3 = [timed(lambda: conn.execute(q).fetchall()) for q in [q1,q2,q3]]
+    print('one chunk  %d subselects: correlated %.3fs   join of the chunk %.3fs   '
+          'join of all %.3fs (same rows)'%(len(structures), t1, t2, t3))
+
+if __name__ == '__main__':
+    main(*map(int,argv[1:]))
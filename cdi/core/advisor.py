@@ -0,0 +1,91 @@
+# External
+from typing import (Any,
+                    List     as L,
+                    Dict     as D,
+                    Tuple    as T)
+
+# Internal
+from cdi.core.utils    import Base
+from cdi.core.expr     import Expr as SQLExpr, SUBSELECT
+from cdi.core.classes  import Land, LandObj, Ref
+from cdi.core.optimize import correlation, _tab
+################################################################################
+'''
+Which indexes the source database needs for the landing queries of a Land (see
+Land.makeSQL): the columns they filter on, join on and correlate subselects
+on, which are not the first column of any index yet
+'''
+
+class Advice(Base):
+    '''A missing index on a column, and what it would be used for'''
+    def __init__(self, table : str, column : str, use : str) -> None:
+        self.table  = table
+        self.column = column
+        self.use    = use # filter, join or correlation
+
+    def __str__(self) -> str:
+        return 'Advice<%s.%s: %s>'%(self.table,self.column,self.use)
+
+    @property
+    def name(self) -> str:
+        return '_cdi_%s_%s'%(self.table,self.column)
+
+    def create(self) -> str:
+        return 'CREATE INDEX `%s` ON `%s` (`%s`)'%(self.name,self.table,self.column)
+
+    def sql(self) -> L[str]:
+        '''
+        MySQL statements creating the index unless the table already has one of
+        that name, so that a file can be run twice (MySQL has no CREATE INDEX
+        IF NOT EXISTS, hence the prepared statement)
+        '''
+        exists = "SELECT COUNT(*) FROM information_schema.STATISTICS WHERE " \
+                 "TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '%s' AND INDEX_NAME = '%s'"%(
+                    self.table,self.name)
+        return ["SET @cdi_index = IF((%s) > 0, 'DO 0', '%s')"%(exists,self.create()),
+                'PREPARE cdi_index FROM @cdi_index', 'EXECUTE cdi_index',
+                'DEALLOCATE PREPARE cdi_index']
+
+def _walk(e : Any, table : str, out : L[T[str,str,str]], filter : bool) -> None:
+    '''
+    Correlations of the subselects in an expression and, if it is a filter,
+    the columns of the landed table it uses
+    '''
+    if isinstance(e, SUBSELECT):
+        c = correlation(table, e)
+        t = _tab.match(c[0]) if c else None # (always a match, if correlated)
+        if c and t:
+            out.append((t.group(1), c[1].split('.')[-1], 'correlation'))
+        return # (the columns inside belong to another table)
+    if isinstance(e, Ref) and e.obj == table and filter:
+        out.append((table, e.attr, 'filter'))
+    elif isinstance(e, SQLExpr):
+        for x in e.fields(): _walk(x, table, out, filter)
+
+def columns(land : Land) -> L[T[str,str,str]]:
+    '''
+    (table, column, use) of the columns the landing looks records up by:
+    those in filters, the ids which FKs are joined with (e.g. by the
+    integrity check) and the keys of correlated subselects
+    '''
+    out = [] # type: L[T[str,str,str]]
+    for en,e in land.schema.entities.items():
+        lo = land.ents.get(e,LandObj(e))
+        if lo.where is not None: _walk(lo.where, en, out, True)
+        for fk in e.fks.values():
+            if fk.tar in land.schema.entities:
+                out.append((fk.tar, str(land.schema.entities[fk.tar].id), 'join'))
+        for x in (lo.consts or {}).values(): _walk(x, en, out, False)
+    return out
+
+def advise(land : Land, indexes : D[str,L[L[str]]]) -> L[Advice]:
+    '''
+    Missing indexes of a landing, given the indexes of the database
+    ({table : [[column]]}, see reflect.indexes): one per column which does not
+    start an index, for its first use (the entities in order)
+    '''
+    leading = {(t,ix[0]) for t,ixs in indexes.items() for ix in ixs if ix}
+    out     = {} # type: D[T[str,str],Advice]
+    for t,c,use in columns(land):
+        if (t,c) not in leading and (t,c) not in out: out[(t,c)] = Advice(t,c,use)
+    return list(out.values())
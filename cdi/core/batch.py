@@ -0,0 +1,161 @@
+# External
+from typing import (Any, Type as Ty,
+                    List     as L,
+                    Dict     as D,
+                    Tuple    as T,
+                    Union    as U)
+from time            import perf_counter
+from multiprocessing import get_context, get_all_start_methods
+
+# Internal
+from cdi.core.utils   import Base, Conn, compile_counter
+from cdi.core.expr    import Expr as SQLExpr
+from cdi.core.integrity import Integrity
+from cdi.core.exposed import (Schema as UserSchema, Overlap as UserOverlap,
+                              Entity as UserEntity, JavaFunc as UserJavaFunc)
+from cdi.core.primitives import Java
+from cdi.core.cql     import CQL, Input
+################################################################################
+'''
+Generating many CQL files at once, e.g. one Migrate per source database into a
+common target schema
+'''
+
+class Pipeline(Base):
+    '''Specification of one file: a Migrate or Merge and its inputs/outputs'''
+    def __init__(self,
+                 path     : str,
+                 op       : Ty[CQL],
+                 src      : UserSchema,
+                 tar      : UserSchema,
+                 src_conn : Input,
+                 tar_conn : Input,
+                 merged   : Conn                        = None,
+                 overlap  : UserOverlap                 = None,
+                 filt1    : D[UserEntity,SQLExpr]       = None,
+                 filt2    : D[UserEntity,SQLExpr]       = None,
+                 funcs    : U[L[Java],L[UserJavaFunc]]  = None,
+                 compact  : bool                        = False,
+                 chunks1  : D[UserEntity,L[Any]]        = None,
+                 chunks2  : D[UserEntity,L[Any]]        = None,
+                 staging1 : str                         = None,
+                 staging2 : str                         = None,
+                 integrity1 : Integrity                 = None,
+                 integrity2 : Integrity                 = None,
+                 indexes1 : D[str,L[L[str]]]            = None,
+                 indexes2 : D[str,L[L[str]]]            = None,
+                 groups1  : L[L[UserEntity]]            = None,
+                 groups2  : L[L[UserEntity]]            = None
+                ) -> None:
+        self.path     = path
+        self.op       = op
+        self.src      = src
+        self.tar      = tar
+        self.src_conn = src_conn
+        self.tar_conn = tar_conn
+        self.merged   = merged
+        self.overlap  = overlap
+        self.filt1    = filt1
+        self.filt2    = filt2
+        self.funcs    = funcs
+        self.compact  = compact
+        self.chunks1  = chunks1
+        self.chunks2  = chunks2
+        self.staging1 = staging1
+        self.staging2 = staging2
+        self.integrity1 = integrity1
+        self.integrity2 = integrity2
+        self.indexes1 = indexes1
+        self.indexes2 = indexes2
+        self.groups1  = groups1
+        self.groups2  = groups2
+
+    def __str__(self) -> str:
+        return '%s<%s->%s: %s>'%(self.op.__name__,self.src.name,self.tar.name,self.path)
+
+    def cql(self) -> CQL:
+        return self.op(src = self.src, tar = self.tar, overlap = self.overlap,
+                       filt1 = self.filt1, filt2 = self.filt2, funcs = self.funcs,
+                       chunks1 = self.chunks1, chunks2 = self.chunks2,
+                       staging1 = self.staging1, staging2 = self.staging2,
+                       integrity1 = self.integrity1, integrity2 = self.integrity2,
+                       indexes1 = self.indexes1, indexes2 = self.indexes2,
+                       groups1 = self.groups1, groups2 = self.groups2)
+
+class Timing(Base):
+    '''How long one pipeline took to compile (in the parent) and write'''
+    def __init__(self, pipeline : Pipeline, compile : float, write : float,
+                 chars : int) -> None:
+        self.pipeline = pipeline
+        self.compile  = compile
+        self.write    = write
+        self.chars    = chars
+
+    def __str__(self) -> str:
+        return '%s  compile %.3fs  write %.3fs  %d chars'%(
+                    self.pipeline,self.compile,self.write,self.chars)
+
+class Report(Base):
+    '''Timings of a batch, in the order the pipelines were given'''
+    def __init__(self, timings : L[Timing], wall : float, compiled : int,
+                 reused : int) -> None:
+        self.timings  = timings
+        self.wall     = wall
+        self.compiled = compiled
+        self.reused   = reused
+
+    def __str__(self) -> str:
+        rows = ['%-50s %8.3fs %8.3fs %10d'%(str(t.pipeline)[:50],t.compile,t.write,t.chars)
+                    for t in self.timings]
+        head = '%-50s %9s %9s %10s'%('pipeline','compile','write','chars')
+        foot = '%d pipelines in %.3fs (%d compilations, %d reused)'%(
+                    len(self.timings),self.wall,self.compiled,self.reused)
+        return '\n'.join([head] + rows + [foot])
+
+# (pipeline, compiled CQL) for each job while a pool of workers is writing
+_jobs = [] # type: L[T[Pipeline,CQL]]
+
+def _write(i : int) -> T[int,float,int]:
+    '''Write the file of one job (in a forked pool worker, or serially)'''
+    p,c = _jobs[i]
+    t0  = perf_counter()
+    with open(p.path,'w') as f:
+        n = c.write(f, p.src_conn, p.tar_conn, p.merged, compact = p.compact)
+    return i, perf_counter() - t0, n
+
+def batch(pipelines : L[Pipeline], workers : int = 1) -> Report:
+    '''
+    Generate the file of every pipeline.
+
+    Everything is compiled up front, in this process: exposed schemas and
+    overlaps which are shared by several pipelines are only compiled once
+    (see utils.compiled). The files are then rendered and written by a pool of
+    forked processes, which inherit all of this rather than receiving pickled
+    copies.
+    '''
+    global _jobs
+    t0 = perf_counter()
+    c0,r0 = [sum(c.values()) for c in [compile_counter.compiled,compile_counter.reused]]
+
+    compile = [] # type: L[float]
+    results = {} # type: D[int,T[float,int]]
+    try:
+        for p in pipelines:
+            t = perf_counter()
+            c = p.cql()
+            _jobs.append((p,c))
+            compile.append(perf_counter() - t)
+
+        if workers <= 1 or len(pipelines) <= 1 or 'fork' not in get_all_start_methods():
+            done = map(_write, range(len(_jobs))) # type: Any
+            results = {i:(t,n) for i,t,n in done}
+        else:
+            size = min(workers, len(pipelines))
+            with get_context('fork').Pool(size) as pool:
+                results = {i:(t,n) for i,t,n in pool.imap_unordered(_write, range(len(_jobs)))}
+    finally:
+        _jobs = []
+
+    c1,r1 = [sum(c.values()) for c in [compile_counter.compiled,compile_counter.reused]]
+    timings = [Timing(p,compile[i],*results[i]) for i,p in enumerate(pipelines)]
+    return Report(timings, perf_counter() - t0, c1 - c0, r1 - r0)
@@ -0,0 +1,114 @@
+# External
+from typing import (List     as L,
+                    Dict     as D,
+                    Tuple    as T,
+                    Optional as O)
+from os     import makedirs, scandir, replace, remove, utime, getpid
+from os.path import join
+from time   import time
+from hashlib import sha1
+
+# Internal
+from cdi.core.primitives import CQLSection
+################################################################################
+'''
+Persistent cache of rendered sections, so that regenerating a file after a small
+change only renders the sections which actually changed
+'''
+
+class DiskCache(object):
+    '''
+    A directory of rendered sections, one file per section, which survives
+    across runs. Files are named by a digest of the section's show() text,
+    which is much cheaper to get than a digest of the section's nodes and only
+    ever maps the same text to the same output: what is saved on a hit is the
+    alignment (or minification) and the text of the file.
+
+    Files are evicted least-recently-used first (by modification time, which is
+    refreshed on every hit) once their total size exceeds maxbytes. The
+    directory must be cleared if the way shown text is aligned changes.
+
+    Each pass (see CQL.iter_chunks) records which sections had to be rendered
+    in `recomputed`, and how many were read from disk in `reused`.
+    '''
+    ext = '.cql'
+
+    def __init__(self, path : str, maxbytes : int = 256 * 2**20) -> None:
+        self.path     = path
+        self.maxbytes = maxbytes
+        makedirs(path, exist_ok = True)
+
+        # key -> (last use, size in bytes)
+        self.index = {e.name[:-len(self.ext)] : (e.stat().st_mtime, e.stat().st_size)
+                        for e in scandir(path)
+                        if e.is_file() and e.name.endswith(self.ext)} # type: D[str,T[float,int]]
+        self.size  = sum(s for _,s in self.index.values())
+        self.start()
+
+    def __str__(self) -> str:
+        args = [self.path,len(self.index),self.size,len(self.recomputed),self.reused]
+        return 'DiskCache<{}: {} files, {} bytes; {} recomputed, {} reused>'.format(*args)
+
+    def start(self, tag : str = '') -> None:
+        '''
+        Begin a new pass: reset the statistics of the last one. Sections
+        rendered differently (e.g. in compact mode) get a distinct tag.
+        '''
+        self.tag        = tag
+        self.recomputed = []  # type: L[str]
+        self.reused     = 0
+
+    def key(self, text : str) -> str:
+        '''Key of the section whose show() is text'''
+        key = sha1(text.encode('utf-8')).hexdigest()
+        return key + ('-' + self.tag if self.tag else '')
+
+    def __contains__(self, key : object) -> bool:
+        return key in self.index
+
+    def get(self, key : str) -> O[str]:
+        '''Rendered text of a section, if it is on disk'''
+        file = join(self.path, key + self.ext)
+        if key not in self.index: return None
+        try:
+            with open(file, encoding = 'utf-8', newline = '') as f: out = f.read()
+        except FileNotFoundError: # removed by another process
+            self.size -= self.index.pop(key)[1]
+            return None
+        self.index[key] = (time(), self.index[key][1])
+        utime(file)
+        self.reused += 1
+        return out
+
+    def put(self, key : str, sect : CQLSection, out : str) -> None:
+        '''Store the rendered text of a section (which get() did not find)'''
+        self.recomputed.append(self.label(sect))
+        file = join(self.path, key + self.ext)
+        data = out.encode('utf-8')
+        tmp  = '%s.%d.tmp'%(file, getpid())
+        with open(tmp, 'wb') as f: f.write(data)
+        replace(tmp, file) # never leave a partly written entry behind
+        self.size -= self.index.get(key, (0, 0))[1]
+        self.index[key] = (time(), len(data))
+        self.size += len(data)
+        self.evict()
+
+    def evict(self) -> None:
+        '''Remove least recently used files until under maxbytes'''
+        if self.size <= self.maxbytes: return
+        for key,(_,size) in sorted(self.index.items(), key = lambda kv: kv[1][0]):
+            if self.size <= self.maxbytes: break
+            try:                      remove(join(self.path, key + self.ext))
+            except FileNotFoundError: pass
+            del self.index[key]
+            self.size -= size
+
+    def report(self) -> str:
+        rows = ['recomputed '+l for l in self.recomputed]
+        return '\n'.join(rows + [str(self)])
+
+    @staticmethod
+    def label(sect : CQLSection) -> str:
+        name = getattr(sect, 'name', '')
+        return '%s %s'%(type(sect).__name__, name) if isinstance(name, str) \
+                    else type(sect).__name__
@@ -1,5 +1,5 @@
 # External
-from typing import (Any, TYPE_CHECKING,
+from typing import (Any, TYPE_CHECKING, Iterable,
                     Set      as S,
                     List     as L,
                     Dict     as D,
@@ -16,18 +16,21 @@ from itertools import chain
 if TYPE_CHECKING:
     from cdi.core.exposed import JavaFunc
 
-from cdi.core.utils      import Base, Conn, flatten
+from cdi.core.utils      import (Base, Compact, Conn, flatten, once, staged,
+                                 digest)
 from cdi.core.expr       import Expr as SQLExpr,Fn,Literal # FK as ExprFK, Attr as ExprAttr,
+from cdi.core            import optimize
+from cdi.core.optimize   import GroupJoin
 from cdi.core.primitives import (Type,Attr as CQLAttr, FK as CQLFK,
     Entity as CQLEntity, Gen as CQLGen,
     Constraint,Expr as CQLExpr,
-    LandInstance,QueryObj,
+    LandInstance,CoProdInstance,QueryObj,
     Schema as CQLSchema,Typeside,
     PathEQ as CQLPEQ,EQ as CQLEQ, Path as CQLPath, ObsEQ as CQLOEQ,
     Constraints,
     JavaFunc as CQLFunc,ExprFunc as CQLExprFunc,
     GenAttr as CQLGenAttr,
-    JLit as CQLJLit, Quotient, Instance,
+    JLit as CQLJLit, Quotient, Instance, Exec,
     SchemaColimitQuotient,SchemaColimitModify)
 '''
 "2nd" level of representation, in between user-exposed constructors and low-level
@@ -55,8 +58,9 @@ class Rewrite(Base):
             # EDIT 5/6: NEVER PREFIX W/ ENTITY NAME
             return attr # ent + '_' + attr
 
-class Attr(Base):
+class Attr(Compact):
     '''Internal representation of an entity's attribute'''
+    __slots__ = ('name','obj','dtype','id')
     def __init__(self,
                  name   : str,
                  obj    : str,
@@ -82,8 +86,9 @@ class Attr(Base):
         '''A length-1 path of the attribute'''
         return Path(self.obj,[self])
 
-class FK(Base):
+class FK(Compact):
     ''' Foreign key which knows src and target'''
+    __slots__ = ('name','src','tar','id')
     def __init__(self,
                  name : str,
                  src  : str,
@@ -121,6 +126,10 @@ class Entity(Base):
     def __str__(self)->str:
         return 'Entity<%s>'%self.name
 
+    def copy(self) -> 'Entity':
+        '''Shallow copy: new attr/fk dicts, sharing the (immutable) Attrs/FKs'''
+        return Entity(self.name, dict(self.attrs), dict(self.fks), self.id)
+
     @property
     def ids(self) -> L[str]:
         '''Names of all identifying attributes / relations'''
@@ -155,10 +164,12 @@ class Entity(Base):
                     for fkn,fk in self.fks.items()]
         return [out] + out2
 
-class Gen(Base):
+class Gen(Compact):
     '''
     A generator for some entity, to be used in CQL expressions
     '''
+    __slots__ = ('name','ent')
+    _interned = False # refers to a (mutable) Entity
     def __init__(self, name : str, ent : Entity) -> None:
         self.name  = name
         self.ent   = ent
@@ -187,6 +198,11 @@ class Expr(UserExposedCQLExpr,metaclass=ABCMeta):
     @abstractmethod
     def gens(self)->L[Gen]: raise NotImplementedError
 
+    @abstractmethod
+    def refs(self)->S[T[str,str]]:
+        '''(entity, attr/FK name) of everything the expression reads'''
+        raise NotImplementedError
+
     @abstractmethod
     def expr(self,schema:'Schema')->CQLExpr: raise NotImplementedError
 
@@ -215,6 +231,7 @@ class Ref(Expr,SQLExpr):
         else: raise ValueError(o,self,' not in ',set(o.attrs)|set(o.fks))
 
     def gens(self)->L[Gen]: return []
+    def refs(self)->S[T[str,str]]: return {(self.obj,self.attr)}
 
     def expr(self, s : 'Schema')->CQLExpr:
         a = self.realize(s)
@@ -242,6 +259,7 @@ class GenAttr(Expr):
 
     def __str__(self)->str: return self.name
     def gens(self)->L[Gen]: return [self.gen]
+    def refs(self)->S[T[str,str]]: return {(self.gen.ent.name,self.name)}
     def expr(self,schema:'Schema')->CQLExpr:
         en = self.gen.ent.name
         assert en in schema, 'Cannot find entity %s in %s'%(en,schema.entities)
@@ -267,6 +285,7 @@ class JLit(Expr):
         return self.jlit()
 
     def gens(self) -> L[Gen]: return []
+    def refs(self) -> S[T[str,str]]: return set()
 
     def jlit(self) -> CQLJLit:
         return CQLJLit(str(self.val),self._dtype.name)
@@ -298,6 +317,10 @@ class Path(Expr):
 
     def gens(self)->L[Gen]: return []
 
+    def refs(self)->S[T[str,str]]:
+        return {(x.src,x.name) if isinstance(x,FK) else (x.obj,x.name)
+                    for x in self.xs if isinstance(x,(FK,Attr))}
+
     def expr(self, schema:'Schema') -> CQLExpr: return self.path()
 
     def mk_expr(self)->Expr: return self
@@ -315,9 +338,11 @@ class Path(Expr):
         '''Determine if the path can exist within a schema'''
         for x in self.xs:
             if isinstance(x,FK):
-                if x not in schema[x.src].fks.values(): return False
+                fks = schema[x.src].fks
+                if x.name not in fks or fks[x.name] != x: return False
             elif isinstance(x,Attr):
-                if x not in schema[x.obj].attrs.values(): return False
+                attrs = schema[x.obj].attrs
+                if x.name not in attrs or attrs[x.name] != x: return False
         return True
 
 class PathEQ(Base):
@@ -351,17 +376,24 @@ class ObsEQ(Base):
         return CQLOEQ(self.e1.expr(self.s),self.e2.expr(self.s),gs)
 
 class Schema(Base):
-    '''Internal representation a schema'''
+    '''
+    Internal representation a schema
+
+    Copies are copy-on-write: a copy shares its entities with the original,
+    and an entity is only cloned when one side asks to modify it (mutable)
+    '''
+    _meta = ('_shared',)
     def __init__(self,
                  name     : str,
-                 entities : L[Entity]   = None,
-                 pes      : L[PathEQ]   = None,
-                 oes      : L[ObsEQ]    = None
+                 entities : L[Entity]        = None,
+                 pes      : Iterable[PathEQ] = None,
+                 oes      : Iterable[ObsEQ]  = None
                  ) -> None:
         self.name     = name
         self.entities = {e.name:e for e in entities or []}
         self.pes      = set(pes or [])
         self.oes      = set(oes or [])
+        self._shared  = set() # type: S[str] # entities also held by a copy
 
     def __str__(self)->str:
         return 'Schema<%s,%d entities, %d pathEQs>'%(self.name,len(self.entities),len(self.pes))
@@ -376,6 +408,29 @@ class Schema(Base):
         '''Get an object by name'''
         return self[objname]
 
+    def copy(self) -> 'Schema':
+        '''Cheap copy which shares all entities with this schema'''
+        new = Schema(self.name, pes = self.pes, oes = self.oes)
+        new.entities.update(self.entities)
+        new._shared.update(self.entities)
+        self._shared.update(self.entities)
+        return new
+
+    def mutable(self, objname : str) -> Entity:
+        '''Get an entity which can be modified in place without affecting any
+           other schema (clones it if it is shared with a copy)'''
+        if objname in self._shared:
+            self._shared.discard(objname)
+            self.entities[objname] = self.entities[objname].copy()
+        return self.entities[objname]
+
+    def project(self, uses : D[str,S[str]]) -> 'Schema':
+        '''Only the entities in `uses`, with only the attributes/FKs listed there'''
+        ents = [Entity(en, {an:a for an,a in e.attrs.items() if an in uses[en]},
+                           {fn:f for fn,f in e.fks.items()   if fn in uses[en]}, e.id)
+                    for en,e in self.entities.items() if en in uses]
+        return Schema(self.name, ents, self.pes, self.oes)
+
     @property
     def cql_entities(self)->D[str,CQLEntity]:
         return {k:v.ent() for k,v in self.entities.items()}
@@ -413,6 +468,8 @@ class ExprFunc(Expr):
 
     def gens(self)->L[Gen]:
         return flatten([a.gens() for a in self.args])
+    def refs(self)->S[T[str,str]]:
+        return set().union(*[a.refs() for a in self.args])
     def expr(self,schema:Schema)->CQLExpr:
         return CQLExprFunc(self.func.javafunc(),[e.expr(schema) for e in self.args])
     def mk_expr(self)->Expr: return self
@@ -423,6 +480,8 @@ class LandObj(Base):
     src    - entity being landed
     consts - attributes to be created upon landing
     where  - constraint on which records are landed
+    bounds - ids at which the records are split into chunks, which are landed
+             separately (keyset pagination: see cdi.core.keyset)
     #id     - specify what to use ID column (IMPORTANT that this is what other
     #         tables are referring to in the FKs to this entity)
     '''
@@ -430,36 +489,169 @@ class LandObj(Base):
                  src    : Entity,
                  consts : D[Attr,SQLExpr] = None,
                  where  : SQLExpr = None,
+                 bounds : L[Any]  = None
                 ) -> None:
         self.src    = src
         self.consts = consts
         self.where  = where
+        self.bounds = bounds or []
 
     def __str__(self)->str:
         return 'LandObj<%s>'%self.src.name
 
+    def chunks(self) -> L[T[Any,Any]]:
+        '''(lowest id, id after the last) of each chunk: None means unbounded'''
+        bs = [None] + list(self.bounds) + [None] # type: L[Any]
+        return list(zip(bs,bs[1:]))
+
 class Land(Base):
-    '''Higher level of abstraction than the primitive jdbc_instance - exposed to user'''
-    def __init__(self, schema : Schema, ents : L[LandObj] = None) -> None:
-        self.schema = schema
-        self.ents   = {e.src : e for e in ents or []}
+    '''
+    Higher level of abstraction than the primitive jdbc_instance - exposed to user
+
+    With unnest, correlated aggregate subselects in the landing of unfiltered
+    entities become joins with grouped tables (see optimize.unnest). With
+    simplify, the landing expressions are simplified and those repeated within
+    an entity's landing are computed once per record (see optimize.simplify,
+    optimize.hoist)
+
+    With a staging fingerprint (of the database's content, not merely of its
+    schema: see reflect.content_fingerprint), the computed columns of each entity are materialized into
+    a staging table, keyed by the entity's id, by Exec commands which precede
+    the landing (see execs). The landing then joins that table instead of
+    computing them. Staging tables are named after the fingerprint and their
+    query, and only created if they do not exist yet: reruns against the same
+    data reuse them (old ones are left for the user to drop).
+
+    With direct, FK values are landed as they are, to be matched with the ids
+    of their targets by CQL itself: only valid once the FKs are known to be
+    neither NULL nor dangling (see cdi.core.integrity), and if all records are
+    landed by one import_jdbc (no chunks nor groups).
+
+    With the indexes of the database ({table : [[column]]}, see reflect.indexes),
+    the indexes missing for the landing queries are created first, unless an
+    earlier run of the file has created them (see cdi.core.advisor).
+
+    With groups (of entity names), the entities of each group are landed by
+    separate import_jdbc instances (see insts, and keyset.partition for groups
+    balanced by numbers of records). Entities in no group form one more.
+    '''
+    unnest   = True
+    simplify = True
+    def __init__(self, schema : Schema, ents : L[LandObj] = None,
+                 staging : str = None, direct : bool = False,
+                 indexes : D[str,L[L[str]]] = None, groups : L[L[str]] = None) -> None:
+        self.schema  = schema
+        self.ents    = {e.src : e for e in ents or []}
+        self.staging = staging
+        self.direct  = direct
+        self.indexes = indexes
+        self.groups  = groups
 
     def __str__(self)->str:
         return 'Land<%s>'%self.schema.name
 
+    @staticmethod
+    def costly(x : SQLExpr) -> bool:
+        '''Whether a computed column is worth materializing (not a mere copy)'''
+        return not isinstance(x,(Ref,Literal))
+
+    def staging_query(self, e : Entity, lo : LandObj) -> O[T[str,str]]:
+        '''(staging table, the query which fills it) of an entity, if it has one'''
+        # (in a fixed order, so the query, hence the table, is the same in reruns)
+        consts = {a:x for a,x in sorted((lo.consts or {}).items(), key = lambda ax: ax[0].name)
+                        if self.costly(x)}
+        if self.staging is None or not consts: return None
+        stub  = Entity(e.name, {}, {}, e.id) # just the computed columns
+        inner = self.makeSQL(stub, LandObj(stub,consts,lo.where), unnest=self.unnest,
+                             simplify=self.simplify, quote=False)
+        # (a key not called id, which would be ambiguous in the landing)
+        query = 'SELECT `id` AS `_id`, %s FROM (%s) AS `q`'%(
+                    ', '.join('`%s`'%a.name for a in consts), inner)
+        return '_stage_%s_%s'%(digest([self.staging,query])[:10],e.name), query
+
+    def execs(self, name : str, conn : Conn) -> L[Exec]:
+        '''
+        Commands creating the missing indexes and staging tables (which run
+        before the landing)
+        '''
+        out = [] # type: L[Exec]
+        if self.indexes is not None:
+            from cdi.core.advisor import advise # (it depends on this module)
+            out.extend(Exec('cmd_index_%s_%s_%s'%(name,a.table,a.column),conn,a.sql())
+                        for a in advise(self,self.indexes))
+        for e in self.schema.entities.values():
+            staged = self.staging_query(e,self.ents.get(e,LandObj(e)))
+            if staged:
+                out.append(Exec('cmd_stage_%s_%s'%(name,e.name),conn,
+                                'CREATE TABLE IF NOT EXISTS `%s` (PRIMARY KEY (`_id`)) AS %s'%staged))
+        return out
+
+    def _sql(self, e : Entity, lo : LandObj, chunk : T[Any,Any] = (None,None),
+             where : SQLExpr = None) -> str:
+        '''Landing query of an entity (with another filter, if given)'''
+        staged = self.staging_query(e,lo)
+        if where is not None: lo = LandObj(e,lo.consts,where)
+        return self.makeSQL(e,lo,chunk,self.unnest,self.simplify,staged and staged[0],
+                            direct=self.direct)
+
     def inst(self, name : str, schema : CQLSchema, conn : Conn) -> LandInstance:
-        ents = {e.ent():self.makeSQL(e,self.ents.get(e,LandObj(e))) for e in self.schema.entities.values()}
+        ents = {e.ent():self._sql(e,self.ents.get(e,LandObj(e)))
+                    for e in self.schema.entities.values()}
         return LandInstance(name,conn,schema,ents)
 
+    def insts(self, name : str, schema : CQLSchema, conn : Conn) -> L[Instance]:
+        '''
+        Instances which land the data, the last one (called `name`) with all of
+        it. Unless some entity is split into chunks, or the entities into
+        groups, that is just inst(). Otherwise each group of entities is landed
+        by its own import_jdbc instances (which CQL can run concurrently), the
+        i'th of which lands the i'th chunk of every entity of the group
+        (nothing, for the other entities and those with fewer chunks), and they
+        are combined by coproducts, so that no single query fetches an entire
+        large table.
+        '''
+        los    = [(e,self.ents.get(e,LandObj(e))) for e in self.schema.entities.values()]
+        groups = [{e.name for e,_ in los if e.name in g} for g in self.groups or []]
+        rest   = {e.name for e,_ in los} - set().union(*groups) # in no group
+        groups = [g for g in [rest] + groups if g]
+        if len(groups) == 1 and all(not lo.bounds for _,lo in los):
+            return [self.inst(name,schema,conn)]
+
+        parts = [] # type: L[Instance]
+        for g in groups:
+            for i in range(max(len(lo.bounds) + 1 for e,lo in los if e.name in g)):
+                ents = {e.ent() : self._sql(e,lo,lo.chunks()[i]) if e.name in g and i <= len(lo.bounds)
+                                    else self._sql(e,lo,where=Literal(0))
+                            for e,lo in los}
+                parts.append(LandInstance('%s_%d'%(name,len(parts)),conn,schema,ents))
+
+        out = [parts[0]] # type: L[Instance]
+        for i,part in enumerate(parts[1:],1):
+            out += [part,CoProdInstance(name if i == len(parts) - 1 else '%s_c%d'%(name,i),
+                                        out[-1],part,schema)]
+        return out
+
     @staticmethod
-    def makeSQL(e : Entity, lo : LandObj) -> str:
-        '''Construct a SQL statement which lands data for an entity into CQL'''
+    def makeSQL(e : Entity, lo : LandObj, chunk : T[Any,Any] = (None,None),
+                unnest : bool = False, simplify : bool = False,
+                stage : str = None, quote : bool = True, direct : bool = False) -> str:
+        '''
+        Construct a SQL statement which lands data for an entity into CQL
+        (only the records whose id is in a chunk, see LandObj.chunks), taking
+        its costly computed columns from a staging table, if given
+        '''
 
         # General template
-        land = '\n\t\t"SELECT {id} AS `id`, CONVERT({id},CHAR(50)) AS `uid`'\
+        land = 'SELECT {id} AS `id`, CONVERT({id},CHAR(50)) AS `uid`'\
                '{cols} \n\n\t\t'\
-               'FROM {name} \n\t\t'\
-               'WHERE {cons}"'
+               'FROM {name}{joins} \n\t\t'\
+               'WHERE {cons}'
+        join_stage = '\n\t\tLEFT JOIN `{0}` ON `{0}`.`_id` = {1}.{2}'
+        # Computing repeated expressions in a derived table, which MySQL must
+        # not merge into the outer query (or they are repeated again): it never
+        # merges one with a LIMIT (5.7 has no NO_MERGE hint), here a no-op one
+        derived = '(SELECT {name}.*{cols} FROM {name} WHERE {cons} '\
+                  'LIMIT 18446744073709551615) AS {name}'
 
 
         def showFunc(x : Any) -> str:
@@ -482,6 +674,24 @@ class Land(Base):
 
         idcol  = e.id
         consts = lo.consts or {}
+        where  = lo.where
+        joins  = [] # type: L[GroupJoin]
+        if stage:
+            consts = {a:optimize.Column(stage,a.name) if Land.costly(x) else x
+                        for a,x in consts.items()}
+        # A filter may only keep a few records, for which the subselects are
+        # cheaper than aggregating over the whole inner table (a chunk only
+        # aggregates the inner records of its own range of ids)
+        if unnest and (where is None or isinstance(where,Literal) and where.x == 1):
+            exprs,joins = optimize.unnest(e.name,list(consts.values())+([where] if where else []),
+                                          chunk,str(idcol))
+            consts = dict(zip(consts,exprs))
+            if where: where = exprs[-1]
+        hoisted  = {} # type: D[str,SQLExpr]
+        if simplify:
+            where = optimize.simplify(where)
+            exprs,hoisted = optimize.hoist(e.name,optimize.simplify(list(consts.values())))
+            consts = dict(zip(consts,exprs))
 
         # String constants
         com      = ',\n\t\t\t'
@@ -509,7 +719,8 @@ class Land(Base):
                         for n,a in e.attrs.items() ] # if a not in add_]
 
         fknames  = [fk for fk in e.fks]
-        fks      = [fstr.format(name=fk,obj=e.name,id=idcol) for fk in fknames]
+        fks      = [astr.format(fk,'') if direct else fstr.format(name=fk,obj=e.name,id=idcol)
+                        for fk in fknames]
 
         addcols  = [addstr.format(e.show(showFunc),'+0E0' if a.dtype.name == 'Double' else '',a.name)
                        for a,e in consts.items()]
@@ -517,9 +728,23 @@ class Land(Base):
         cols     = ''.join(ats+  addcols + fks)
 
 
-        cons     = lo.where.show(showFunc) if lo.where else '1'
+        cons     = where.show(showFunc) if where else '1'
+        lower,upper = chunk
+        keyset   = ([] if lower is None else ['%s >= %s'%(idcol,showFunc(Literal(lower)))]) \
+                 + ([] if upper is None else ['%s < %s'%(idcol,showFunc(Literal(upper)))])
+        if keyset: cons = ' AND '.join(['(%s)'%cons] + keyset)
+
+        js       = ''.join('\n\t\t'+j.show(showFunc) for j in joins)
+        if stage: js = join_stage.format(stage,e.name,idcol) + js
 
-        return land.format(name=e.name,id=idcol,cols=cols,cons=cons)
+        name     = e.name
+        if hoisted:
+            hs   = ''.join(addstr.format(x.show(showFunc),'',c) for c,x in hoisted.items())
+            name = derived.format(name=e.name,cols=hs,cons=cons)
+            cons = '1'
+
+        sql = land.format(name=name,id=idcol,cols=cols,joins=js,cons=cons)
+        return '\n\t\t"%s"'%sql if quote else sql
 
 class EQ(Base):
     '''Expression equality, found in the WHERE clause of CQL uber flower queries'''
@@ -550,7 +775,8 @@ class SQLAttr(New):
 
     def add(self,s:'Schema') -> None:
         assert self.ent in s
-        s[self.ent].attrs[self.attr.name] = self.attr
+        e = s.mutable(self.ent)
+        e.attrs[self.attr.name] = self.attr
 
 class NewAttr(New):
     '''Create a new attribute during an CQL query'''
@@ -568,7 +794,8 @@ class NewAttr(New):
 
     def add(self,s:'Schema')->None:
         assert self.ent.name in s, '%s not in %s'%(self.ent,s.entities.keys())
-        s[self.ent.name].attrs[self.attr.name] = self.attr
+        e = s.mutable(self.ent.name)
+        e.attrs[self.attr.name] = self.attr
 
 class NewFK(New):
     '''Create a new FK during an CQL query for an existing object...might be buggy'''
@@ -582,7 +809,8 @@ class NewFK(New):
 
     def add(self,s:'Schema')->None:
         assert self.ent.name in s, '%s not in %s'%(self.ent,s.entities.keys())
-        s[self.ent.name].fks[self.fk.name] = self.fk
+        e = s.mutable(self.ent.name)
+        e.fks[self.fk.name] = self.fk
 
 class NewEntity(New):
     '''Construct an entirely new object from an CQL query'''
@@ -606,6 +834,7 @@ class NewEntity(New):
     def add(self,s:'Schema')->None:
         assert self.ent.name not in s
         s.entities[self.ent.name] = self.ent
+        s._shared.add(self.ent.name) # self.ent may be added to other schemas
 
     def qobj(self,fullschema : Schema)->QueryObj:
         return QueryObj(ent  = self.ent.name,
@@ -619,22 +848,27 @@ class Overlap(Base):
         -  Path Equalities (the starts of the paths are identified with each other)
         -  "New" entities/attributes (where the new thing exists in the other schema)
     Not supported: equating entities which have NO path equalities (not necessary?)
+
+    Structures derived from these (patheqs, entities, patheqs_simple) are built
+    on first use, and the types of new attributes are checked in one pass by
+    validate(). An Overlap is not modified after construction.
     '''
+    _meta = ('_derived',)
     def __init__(self,
                  s1         : Schema,
                  s2         : Schema,
-                 patheqs    : L[PathEQ]   = None,
-                 sa1        : L[SQLAttr]  = None,
-                 na1        : L[NewAttr]  = None,
-                 ne1        : L[NewEntity]= None,
-                 nf1        : L[NewFK]    = None,
-                 sa2        : L[SQLAttr]  = None,
-                 na2        : L[NewAttr]  = None,
-                 ne2        : L[NewEntity]= None,
-                 nf2        : L[NewFK]    = None,
+                 patheqs    : Iterable[PathEQ]   = None,
+                 sa1        : Iterable[SQLAttr]  = None,
+                 na1        : Iterable[NewAttr]  = None,
+                 ne1        : Iterable[NewEntity]= None,
+                 nf1        : Iterable[NewFK]    = None,
+                 sa2        : Iterable[SQLAttr]  = None,
+                 na2        : Iterable[NewAttr]  = None,
+                 ne2        : Iterable[NewEntity]= None,
+                 nf2        : Iterable[NewFK]    = None,
                 )->None:
         self.s1, self.s2 = s1, s2
-        self.patheqs  = {p.p1:p.p2 for p in patheqs or []}
+        self.pes      = list(patheqs or [])
         self.na1      = set(na1 or [])
         self.ne1      = {ne.ent.name:ne for ne in ne1 or []}
         self.sa1      = set(sa1 or [])
@@ -644,34 +878,88 @@ class Overlap(Base):
         self.nf1      = set(nf1 or [])
         self.nf2      = set(nf2 or [])
 
-        # Make sure the type of the CQL expr output matches the new attribute
+    @once
+    @staged
+    def validate(self) -> None:
+        '''Make sure the type of the CQL expr output matches the new attribute'''
         for nas,schema in [(self.na1,self.s1),(self.na2,self.s2)]:
             for na in nas:
                 t1,t2 = na.attr.dtype.name, na.expr.expr(schema).dtype
                 assert t1 == t2, (na,'"New Attribute" type error: ',t1,t2)
 
-        self.entities = {} # type: D[str,str]
+    @property # type: ignore
+    @once
+    def patheqs(self) -> D[Path,Path]:
+        return {p.p1:p.p2 for p in self.pes}
 
+    @property # type: ignore
+    @once
+    def entities(self) -> D[str,str]:
+        '''Entities identified by the path equalities'''
+        out = {} # type: D[str,str]
         for p1,p2 in self.patheqs.items():
             start1,start2 = [p1.start,p2.start]
             if start1:
                 assert start2
-                self.entities[start1] = start2
-
-        self.patheqs_simple = {p1.xs[0]:p2 for p1,p2 in self.patheqs.items()
-                                if len(p1.xs) == 1}
+                out[start1] = start2
+        return out
+
+    @property # type: ignore
+    @once
+    def patheqs_simple(self) -> D[U[Attr,FK],Path]:
+        '''Length-1 path equalities by their attr/FK, plus the new things'''
+        out = {} # type: D[U[Attr,FK],Path]
+        for p1,p2 in self.patheqs.items():
+            x = p1.xs[0]
+            if len(p1.xs) == 1 and not isinstance(x,JLit): out[x] = p2
 
         for n in self.new1():
             if isinstance(n,NewEntity):
-                self.ne1[n.ent.name] = n
                 for a in n.ent.attrs.values():
-                    self.patheqs_simple[a] = a.path()
+                    out[a] = a.path()
                 for fk in n.ent.fks.values():
-                    self.patheqs_simple[fk] = fk.path()
+                    out[fk] = fk.path()
             elif isinstance(n,NewAttr):
-                self.patheqs_simple[n.attr] = n.attr.path()
+                out[n.attr] = n.attr.path()
             elif isinstance(n,NewFK):
-                self.patheqs_simple[n.fk] = n.fk.path()
+                out[n.fk] = n.fk.path()
+        return out
+
+    @property # type: ignore
+    @once
+    def uses1(self) -> D[str,S[str]]:
+        '''
+        Names of the attributes/FKs of each entity of s1 which a migration along
+        this overlap reads: those in path equations (of the overlap and of s1)
+        and in the expressions of new things, the entities of all generators,
+        and the targets of every FK which is read
+        '''
+        refs = set() # type: S[T[str,str]]
+        ents = set(self.entities) | {p.start for p in self.patheqs if p.start}
+        for p in self.patheqs:  refs |= p.refs()
+        for pe in self.s1.pes:  refs |= pe.p1.refs() | pe.p2.refs()
+        for oe in self.s1.oes:  refs |= oe.e1.refs() | oe.e2.refs()
+        for na in self.na1:
+            refs |= na.expr.refs()
+            ents |= {na.ent.name} | {g.ent.name for g in na.gens}
+        for nf in self.nf1:
+            ents |= {nf.ent.name, nf.gen.ent.name}
+        for ne in self.ne1.values():
+            ents |= {g.ent.name for g in ne.gens} | {g.ent.name for g in ne.fks.values()}
+            for ex in ne.attrs.values(): refs |= ex.refs()
+            for w in ne.where:           refs |= w.e1.refs() | w.e2.refs()
+
+        out = {en:set() for en in ents | {en for en,_ in refs} if en in self.s1} # type: D[str,S[str]]
+        for en,x in refs:
+            if en in out: out[en].add(x)
+        todo = list(out)
+        while todo:
+            ent = self.s1[todo.pop()]
+            for fn in out[ent.name] & set(ent.fks):
+                if ent.fks[fn].tar not in out:
+                    out[ent.fks[fn].tar] = set()
+                    todo.append(ent.fks[fn].tar)
+        return out
 
     def __str__(self)->str:
         return 'Overlap<%s|%s>'%(self.s1.name,self.s2.name)
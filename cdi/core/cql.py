@@ -1,11 +1,18 @@
 # External modules
-from typing import List as L, Dict as D, Tuple as T, Union as U, Optional as O
+from typing import (Any, List as L, Set as S, Dict as D, Tuple as T, Union as U, Optional as O,
+                    IO, Iterator, Callable as C)
 from abc    import ABCMeta,abstractmethod
-from re     import split,sub,findall
+from contextlib import contextmanager
+from re     import compile
+from os.path import exists
+from multiprocessing import get_context, get_all_start_methods
 
 # Internal modules
-from cdi.core.utils      import Base, Conn, flatten, merge_dicts
+from cdi.core.utils      import (Base, Conn, flatten, merge_dicts, interning, Interner,
+                                 stage, staged, output)
 from cdi.core.expr       import Expr as SQLExpr,Fn, Literal as Lit
+from cdi.core.cache      import DiskCache
+from cdi.core.integrity  import Integrity
 
 from cdi.core.exposed    import (Overlap as UserOverlap, Schema as UserSchema,
                                       JavaFunc as UserJavaFunc,Land as UserLand,
@@ -23,13 +30,27 @@ from cdi.core.primitives import (CQLSection,Expr,Gen as CQLGen,JLit,JavaFunc,
                                       CoProdInstance,Exec,Export,GetMapping,
                                       ExprFunc,QueryObj,Java,JavaConst,JavaType,
                                       SchemaColimitQuotient,
-                                      GetSchema,Instance,Include)
+                                      GetSchema,Instance,Include,minify)
 '''
 Defines the high-level operations (Merge/Migrate) that this interface exposes
 to a user --- these are not primitives in CQL - rather, these operations
 construct an CQL file
 '''
 Input = U[UserInstance,Conn] # an input schema is either a DB cxn or a literal instance
+
+# Columns aligned by CQL._align, in order: colon/equals (and AS), arrows, comments
+_eq    = compile(r' [:=(AS)]')
+_finds = [lambda l: _eq.search(l).start(), # type: ignore
+          lambda l: l.find('->'),
+          lambda l: l.find('//')] # type: L[C[[str],int]]
+
+# (render, items) while a pool of workers is rendering
+_pending = (str, []) # type: T[C[[Any],str],L[Any]]
+
+def _render_pending(i : int) -> str:
+    '''Runs in a (forked) pool worker'''
+    render,items = _pending
+    return render(items[i])
 ##########################################################################
 
 class CQL(Base, metaclass = ABCMeta):
@@ -40,6 +61,22 @@ class CQL(Base, metaclass = ABCMeta):
     - filt1/2 correspond to src/tar respectively. They map entities in the schema
       to SQL expressions which are used in the WHERE clause of the query which
       lands data from an external DB.
+    - chunks1/2 map entities to the ids at which their landing is split into
+      separate queries (see cdi.core.keyset)
+    - staging1/2 are fingerprints of the src/tar databases' content (see
+      reflect.content_fingerprint): if given, computed columns are materialized
+      in staging tables there, which are reused as long as the fingerprint is
+      the same (see Land)
+    - integrity1/2 are the results of a pre-flight check of the src/tar
+      databases (see cdi.core.integrity): if they found no NULL or dangling FK,
+      and nothing is filtered out nor landed in chunks or groups, the data is
+      landed without any chase
+    - indexes1/2 are the indexes of the src/tar databases (see reflect.indexes):
+      if given, those which the landing queries lack are created before them
+      (see cdi.core.advisor)
+    - groups1/2 split the src/tar entities into groups, each landed by its own
+      import_jdbc instances, so that CQL can fetch them concurrently (see
+      keyset.partition for groups with about as many records each)
     - overlap specifies the semantic overlap between the two schemas
     - funcs are used to declare any java types/functions/constants that are used
       elsewhere in the input
@@ -57,51 +94,167 @@ class CQL(Base, metaclass = ABCMeta):
                  filt2   : D[UserEntity,SQLExpr]     = None,
                  overlap : UserOverlap               = None,
                  funcs   : U[L[Java],L[UserJavaFunc]]= None,
+                 chunks1 : D[UserEntity,L[Any]]      = None,
+                 chunks2 : D[UserEntity,L[Any]]      = None,
+                 staging1: str                       = None,
+                 staging2: str                       = None,
+                 integrity1 : Integrity              = None,
+                 integrity2 : Integrity              = None,
+                 indexes1   : D[str,L[L[str]]]       = None,
+                 indexes2   : D[str,L[L[str]]]       = None,
+                 groups1    : L[L[UserEntity]]       = None,
+                 groups2    : L[L[UserEntity]]       = None,
                 ) -> None:
 
         self.src    = src.schema()
         self.tar    = tar.schema()
         self.overlap= overlap.overlap() if overlap else Overlap(self.src,self.tar)
+        self.overlap.validate() # once per Overlap, which may be shared
 
         self.filt1  = filt1 or {}
         self.filt2  = filt2 or {}
+        self.chunks1= chunks1 or {}
+        self.chunks2= chunks2 or {}
+        self.staging1 = staging1
+        self.staging2 = staging2
+        self.integrity1 = integrity1
+        self.integrity2 = integrity2
+        self.indexes1   = indexes1
+        self.indexes2   = indexes2
+        self.groups1    = [[e.name for e in g] for g in groups1 or []]
+        self.groups2    = [[e.name for e in g] for g in groups2 or []]
 
         self.funcs  = [f.javafunc() for f in (funcs or []) if isinstance(f,UserJavaFunc)]
         self.jtype  = [t            for t in (funcs or []) if isinstance(t,JavaType)]
         self.jconst = [c            for c in (funcs or []) if isinstance(c,JavaConst)]
 
+        self.interner = None # type: O[Interner] # node reuse during last file()
+
     ######################
     # main public method #
     ######################
-    def file(self, src    : Input, tar : Input, merged : Conn = None) -> str:
+    def file(self, src : Input, tar : Input, merged : Conn = None,
+             cache : DiskCache = None, workers : int = 1, compact : bool = False
+            ) -> str:
         '''A file is just concatenation of sections'''
-        fi = '\n\n\n'.join([s.show() for s in self.sections(src,tar,merged)])
-        return self._align(fi) # attempt to prettify
+        return ''.join(self.iter_chunks(src,tar,merged,cache,workers,compact))
+
+    def write(self, stream : IO[str], src : Input, tar : Input, merged : Conn = None,
+              cache : DiskCache = None, workers : int = 1, compact : bool = False
+             ) -> int:
+        '''
+        Write the file to a stream one section at a time, so that the full text
+        is never held in memory. Returns the number of characters written.
+        '''
+        chunks = self.iter_chunks(src,tar,merged,cache,workers,compact)
+        return sum(stream.write(c) for c in chunks)
+
+    def update(self, path : str, src : Input, tar : Input, merged : Conn = None,
+               cache : DiskCache = None, workers : int = 1, compact : bool = False
+              ) -> int:
+        '''
+        Regenerate the file at path in place: sections are compared with what is
+        already there and the file is only rewritten from the first one which
+        changed. Returns the number of bytes written.
+        '''
+        written = 0
+        with open(path, 'r+b' if exists(path) else 'w+b') as f:
+            same = True # everything so far matches the old file
+            for c in self.iter_chunks(src,tar,merged,cache,workers,compact):
+                b = c.encode('utf-8')
+                if same:
+                    pos = f.tell()
+                    if f.read(len(b)) == b: continue
+                    same = False
+                    f.seek(pos)
+                written += f.write(b)
+            f.truncate()
+        return written
+
+    def iter_chunks(self, src : Input, tar : Input, merged : Conn = None,
+                    cache : DiskCache = None, workers : int = 1,
+                    compact : bool = False) -> Iterator[str]:
+        '''
+        Rendered sections of the file, in order (with their separators).
+        Alignment only ever looks within a paragraph, so each section can be
+        aligned on its own. Sections whose shown text has been rendered before
+        come from a DiskCache, if one is given (each is read from disk when its
+        turn comes). With workers > 1 the rest are rendered by a process pool.
+        Primitives are interned until the iterator is exhausted.
+
+        In compact mode, titles and alignment are skipped and each section is
+        minified onto a single line (see primitives.minify).
+        '''
+        def render(st : T[CQLSection,O[str]]) -> str:
+            return self._render(st[0], compact, st[1])
+        sep = '\n' if compact else '\n\n\n'
+        if cache: cache.start('compact' if compact else '')
+        with interning() as self.interner: # share identical primitives
+            sects = [s for s in self.sections(src,tar,merged)
+                        if not (compact and isinstance(s,Title))]
+            texts = [None] * len(sects) # type: L[O[str]] # show(), if needed for a key
+            keys  = [None] * len(sects) # type: L[O[str]]
+            if cache:
+                for j,s in enumerate(sects):
+                    with stage('render'): texts[j] = shown = s.show()
+                    keys[j] = cache.key(shown)
+            hits  = [cache is not None and k in cache for k in keys]
+            todo  = [(s,t) for s,t,h in zip(sects,texts,hits) if not h]
+            with self._renderer(todo,render,workers) as rendered:
+                for i,(s,t,k,h) in enumerate(zip(sects,texts,keys,hits)):
+                    c = None # type: O[str]
+                    if cache and k and h:
+                        with stage('DiskCache.get'): c = cache.get(k)
+                        if c is None: c = render((s,t)) # gone from the disk
+                    else:
+                        c = next(rendered)
+                        if cache and k: cache.put(k,s,c)
+                    output('file',c)
+                    yield (sep if i else '') + c
 
     #############
     # interface #
     #############
     @abstractmethod
-    def sections(self, src : Input, tar : Input, merged : Conn ) -> L[CQLSection]:
+    def sections(self, src : Input, tar : Input, merged : O[Conn]) -> L[CQLSection]:
         raise NotImplementedError # this is how Merge and Migrate differ
 
     ###################
     # private methods #
     ###################
-    def _lands(self)->T[Land,Land]:
+    @staged
+    def _lands(self, uses : D[str,S[str]] = None)->T[Land,Land]:
         '''
         Given one's overlap and the src/tar filters, construct a Land instance
         which contains info needed to write the import_jdbc section of an CQL file
+        (only of the source entities/columns in `uses`, if given)
         '''
-        items = [(self.src,self.overlap.sa1,{k.name:v for k,v in self.filt1.items()}),
-                 (self.tar,self.overlap.sa2,{k.name:v for k,v in self.filt2.items()})]
+        src   = self.src if uses is None else self.src.project(uses)
+        sa1   = [a for a in self.overlap.sa1 if uses is None or a.attr.name in uses.get(a.ent,())]
+        items = [(src,sa1,{k.name:v for k,v in self.filt1.items()},
+                                            {k.name:v for k,v in self.chunks1.items()},
+                                            self.staging1,self.integrity1,self.indexes1,
+                                            self.groups1),
+                 (self.tar,self.overlap.sa2,{k.name:v for k,v in self.filt2.items()},
+                                            {k.name:v for k,v in self.chunks2.items()},
+                                            self.staging2,self.integrity2,self.indexes2,
+                                            self.groups2)]
 
         l1,l2 =  [Land(schema,
                        [LandObj(src   = e,
                                consts = {a.attr:a.expr for a in sa if a.ent==en},
-                               where  = filt.get(en,Lit(1)))
-                        for en,e in schema.entities.items()])
-                    for schema,sa,filt in items]
+                               where  = filt.get(en,Lit(1)),
+                               bounds = chunks.get(en))
+                        for en,e in schema.entities.items()],
+                       staging,
+                       # filtering records out may leave FKs dangling, and so
+                       # may landing them in parts (one of which may refer to
+                       # records of another, which the coproduct does not resolve)
+                       direct  = bool(integrity and integrity.ok and not filt
+                                      and not any(chunks.values()) and not groups),
+                       indexes = indexes,
+                       groups  = groups)
+                    for schema,sa,filt,chunks,staging,integrity,indexes,groups in items]
         return l1,l2
 
     def _from_db(self,
@@ -123,16 +276,31 @@ class CQL(Base, metaclass = ABCMeta):
         reference, a new record (with labeled NULLs) will be generated, which
         may in turn trigger other null records to also be generated). We then use
         a delete_cascade to remove records which do not meet data integrity constraints.
+
+        If the FKs are known to hold (see Land.direct), the data is landed
+        with its FKs straight away: no chase, nor the mapping from the landing
+        schema, just the delete_cascade.
         '''
         s_core = s.schema('s_%s_core'%name,self._ty,uid=True,fks=False,pe=False)
         s_raw  = s.schema('s_%s_raw'%name,self._ty,uid=True,fks='attr',pe=False)
         s_fk   = s.schema(name+'_fk',self._ty,uid=True,pe=False)
+        execs  = land.execs(name,conn)
+
+        if land.direct:
+            lands = land.insts('i_fk_'+name,s_fk,conn)
+            i     = DelInstance('i_'+name,lands[-1],ss)
+            return i,[s_fk,
+                Title(num,1,'Land data (FK integrity checked, so no chase)'),
+                *execs, *lands,
+                Title(num,2,'Move instance data into real schema'), i]
+
         c_fk   = s.fk_constraints('con_fk_'+name,s_raw)
 
         idm = IdMap('id_core_'+name,s_core)
         m   = self._land_migrate('M_fks_'+name,s_raw,s_fk,idm)
 
-        i_raw = land.inst('i_%s_raw'%name,s_raw,conn)
+        lands = land.insts('i_%s_raw'%name,s_raw,conn)
+        i_raw = lands[-1]
         ich   = ChaseInstance('i_chased_'+name,c_fk,i_raw)
         ifk   = MapInstance('i_fk_'+name,'sigma',m,ich)
         i     = DelInstance('i_'+name,ifk,ss)
@@ -140,7 +308,7 @@ class CQL(Base, metaclass = ABCMeta):
         return i,[s_core,s_raw,s_fk,
                 Title(num,1,'Mappings'), idm,  m,
                 Title(num,2,'Constraints'), c_fk,
-                Title(num,3,'Land data'), i_raw,
+                Title(num,3,'Land data'), *execs, *lands,
                 Title(num,4,'Move "unconstrained" instance data into real schema'),
                 ich,ifk,i,]
 
@@ -172,25 +340,74 @@ class CQL(Base, metaclass = ABCMeta):
         return  [Title(4, name='Export to database'), drop, create, merge]
 
 
+    @classmethod
+    def _render(cls, s : CQLSection, compact : bool = False, text : str = None) -> str:
+        '''Aligned (or minified) text of a section, given its show() if known'''
+        name = type(s).__name__
+        with stage(name, section = True):
+            if text is None:
+                with stage('render'): text = s.show()
+            with stage('minify' if compact else 'align'):
+                out = minify(text) if compact else cls._align(text)
+        output(name, out, section = True)
+        return out
+
     @staticmethod
-    def _align(fi : str) -> str:
+    @contextmanager
+    def _renderer(items   : L[Any],
+                  render  : C[[Any],str],
+                  workers : int
+                 ) -> Iterator[Iterator[str]]:
         '''
-        Aligns colons / arrows / equals on contiguous lines - works kind of poorly
+        Rendered text of sections, in order. With several workers they are
+        rendered by a pool of forked processes, which inherit the sections (so
+        nothing but the text is pickled, and sets iterate in the same order as
+        here, making the output identical to rendering them serially).
         '''
-        pats = [r' [:=(AS)]',r'->',r'//']
-        def process(chunk:str,pat:str)->str:
-            splits,outs = [],[] # type: ignore
-            lines  = chunk.replace('\t','    ').split('\n')
-            splits = [split(pat,line) for line in lines]
-            l      = max([len(s[0]) if len(s)==2 else 0 for s in splits])
+        global _pending
+        if workers <= 1 or len(items) <= 1 or 'fork' not in get_all_start_methods():
+            yield map(render, items)
+            return
+        _pending = (render, items)
+        try:
+            with get_context('fork').Pool(min(workers, len(items))) as pool:
+                yield pool.imap(_render_pending, range(len(items)))
+        finally:
+            _pending = (str, [])
 
-            return '\n'.join([line if len(s)!=2 else sub(pat,' '*(l-len(s[0]))+findall(pat,line)[0],line)
-                                for s,line in zip(splits,lines)])
+    @staticmethod
+    def _align(fi : str) -> str:
+        '''
+        Aligns colons / arrows / equals / comments on contiguous lines - works
+        kind of poorly
+        '''
+        return '\n\n'.join(map(CQL._align_paragraph,
+                               fi.replace('\t','    ').split('\n\n')))
 
-        for pat in pats:
-            chunks = fi.split('\n\n')
-            fi = '\n\n'.join([process(c,pat) for c in chunks])
-        return fi
+    @staticmethod
+    def _align_paragraph(chunk : str) -> str:
+        '''
+        Within a paragraph, each column (' :' etc, '->', '//') is aligned in
+        turn: lines on which its pattern occurs exactly once are padded in
+        front of the match, up to the furthest match. Padding only inserts
+        spaces, which never changes where the patterns occur, so the lines are
+        scanned once up front; afterwards only the matched lines are touched.
+        '''
+        lines = chunk.split('\n')
+        rows  = [[],[],[]] # type: L[L[int]]
+        for i,line in enumerate(lines):
+            if len(_eq.findall(line)) == 1: rows[0].append(i)
+            if line.count('->') == 1:       rows[1].append(i)
+            if line.count('//') == 1:       rows[2].append(i)
+
+        for col,find in zip(rows,_finds):
+            if not col: continue
+            pos   = [find(lines[i]) for i in col]
+            width = max(pos)
+            for i,p in zip(col,pos):
+                if p < width:
+                    lines[i] = lines[i][:p] + ' '*(width-p) + lines[i][p:]
+        return '\n'.join(lines)
 
     @staticmethod
     def _land_migrate(name : str,
@@ -217,22 +434,31 @@ class Migrate(CQL):
     '''
     Given i1 : src and i2 : tar, add the data from i1 to i2 to create a new
     instance of tar
+
+    With pushdown, only the source entities and columns which the migration
+    reads (see Overlap.uses1) are landed and declared in the source schemas,
+    when the source is a database (a literal instance sets every column of its
+    schema, so then the source schema is kept whole).
     '''
+    pushdown = True
     def __str__(self)->str:
         return 'Migrate<%s->%s>'%(self.src.name,self.tar.name)
 
-    def sections(self, src_conn : Input, tar_conn : Input, merged_conn : Conn)-> L[CQLSection]:
+    @staged
+    def sections(self, src_conn : Input, tar_conn : Input, merged_conn : O[Conn])-> L[CQLSection]:
 
         s_inter  = self._inter() # intermediate schema
         starnc   = self.tar.copy()
         starnc.pes = set(); starnc.oes = set()
+        uses     = self.overlap.uses1 if self.pushdown and isinstance(src_conn,Conn) else None
         s1       = self.overlap.add_sql_attr(self.src) # only source has 'extra' attrs from landing, possibly
+        if uses is not None: s1 = s1.project(uses)
 
         src      = s1.schema('src',self._ty) # this is an CQL schema, lower level than the CQL interface schema
         tar      = self.tar.schema('tar',self._ty)
         tarnc    = starnc.schema('tar_nc',self._ty)
         inter    = s_inter.schema('inter',self._ty)
-        l1,l2    = self._lands()
+        l1,l2    = self._lands(uses)
         isrc,src_sects = self._inst(1,'src',src_conn,s1,src,l1)
         itar,tar_sects = self._inst(2,'tar',tar_conn,self.tar,tar,l2)
 
@@ -268,6 +494,7 @@ class Migrate(CQL):
                 Title(3, 4, 'Record linkages'), final,
                 ] + self._export(4,merged_conn,final)
 
+    @staged
     def _inter(self) -> "Schema":
         '''
         Intermediate model with both added and removed entities/attributes/Fks
@@ -278,7 +505,7 @@ class Migrate(CQL):
         copy = self.src.copy() # so that we don't modify the Entities in src
 
         # Get all objects from src which are mapped into the target schema
-        objs = [copy[objname] for objname in self.overlap.entities]
+        objs = [copy.mutable(objname) for objname in self.overlap.entities]
 
         # Remove any attributes which are not mapped somewhere in the target
         for o in objs:
@@ -295,6 +522,7 @@ class Migrate(CQL):
 
         return inter
 
+    @staged
     def qobjs(self,inter:Schema)->L[QueryObj]:
         '''
         Fill out the content for a query (src -> inter), depending on Overlap
@@ -342,7 +570,8 @@ class Merge(CQL):
         return 'Merge<%s->%s>'%(self.src.name,self.tar.name)
 
 
-    def sections(self, src_conn : Input, tar_conn : Input, merged_conn : Conn = None)-> L[CQLSection]:
+    @staged
+    def sections(self, src_conn : Input, tar_conn : Input, merged_conn : O[Conn] = None)-> L[CQLSection]:
 
         s1       = self.overlap.add_sql_attr(self.src)           # extra attributes added during landing, potentially
         t1       = self.overlap.add_sql_attr(self.tar,src=False) # extra attributes added during landing, potentially
@@ -425,6 +654,7 @@ class Merge(CQL):
                 Title(3, 4, 'Record linkages'), final,
                 ] + self._export(4,merged_conn,final)
 
+    @staged
     def add_query_objs(self, querysrc : Schema, src : bool = True) -> L[QueryObj]:
         '''Simple construction of query by just injecting information in source
             and adding new information from overlap'''
@@ -11,7 +11,7 @@ from abc         import ABCMeta,abstractmethod
 from collections import defaultdict
 
 # Internal
-from cdi.core.utils       import Base, flatten, Fn
+from cdi.core.utils       import Base, flatten, Fn, compiled
 from cdi.core.expr        import Expr as SQLExpr,Literal
 from cdi.core.primitives  import Type
 
@@ -29,6 +29,10 @@ from cdi.core.primitives import (
 '''
 Public interface for CQL - merely meant to collect data from users in a friendly
 way and ultimately be converted to classes in classes.py which contain main logic
+
+Compiled results (Schema.schema, Overlap.overlap) are reused for as long as the
+object's content is unchanged. The content is hashed again on every call, so
+any edit is seen, in place (entity.attrs[k] = attr) or not
 '''
 
 ################################################################################
@@ -199,6 +203,7 @@ class PathEQ(Base):
 
 class Schema(Base):
     '''User-exposed object for constructing a schema'''
+    _meta = ('_derived',)
     def __init__(self,
                  name     : str,
                  entities : L[Entity]   = None,
@@ -217,6 +222,7 @@ class Schema(Base):
 
     get = __getitem__
 
+    @compiled
     def schema(self)->Schema_:
         '''To do - distinguish path equalities from observation_equations'''
         es    = [e.ent() for e in self.entities.values()]
@@ -376,6 +382,7 @@ class Overlap(Base):
         the other schema using SQL/CQL expressions
     Arbitrary path equalities (that may involve the newly-constructed attrs/entities)
     '''
+    _meta = ('_derived',)
     def __init__(self,
                  s1        : Schema,
                  s2        : Schema,
@@ -404,12 +411,13 @@ class Overlap(Base):
     def __str__(self)->str:
         return 'Overlap<%s | %s>'%(self.s1.name,self.s2.name)
 
+    @compiled
     def overlap(self)->Overlap_:
 
         sa1,sa2 = [[SQLAttr_(a.ent.name,Attr_(a.attr,a.ent.name,a.dtype.type(),id=False),a.expr)
                     for a in sa] for sa in [self.sa1,self.sa2]]
 
-        s1,s2 = [s.schema() for s in [self.s1,self.s2]]
+        s1,s2 = [s.schema().copy() for s in [self.s1,self.s2]] # modified below
         for schema,sqlattrs in [(s1,sa1),(s2,sa2)]:
             for sqlattr in sqlattrs: sqlattr.add(schema)
 
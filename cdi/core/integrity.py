@@ -0,0 +1,61 @@
+# External
+from typing  import (Any,
+                     List     as L,
+                     Dict     as D)
+
+# Internal
+from cdi.core.utils   import Base, stage
+from cdi.core.exposed import Schema
+################################################################################
+'''
+Pre-flight check of the referential integrity of a database (SQLite, or MySQL
+via any DB-API connection), before landing it. If no FK value is NULL or
+dangling, the landed data needs no chase to repair its FKs (see CQL._from_db).
+'''
+
+class Integrity(Base):
+    '''
+    Number of records of each entity whose FK is NULL or refers to no record of
+    its target: {entity : {FK : count}}, for all entities with FKs
+    '''
+    def __init__(self, dangling : D[str,D[str,int]]) -> None:
+        self.dangling = dangling
+
+    def __str__(self) -> str:
+        bad = ['%s.%s: %d'%(e,f,n) for e,fs in sorted(self.dangling.items())
+                                    for f,n in sorted(fs.items()) if n]
+        return 'Integrity<%s>'%(', '.join(bad) or 'ok')
+
+    @property
+    def ok(self) -> bool:
+        return not any(n for fs in self.dangling.values() for n in fs.values())
+
+    def entity(self, name : str) -> D[str,int]:
+        '''Dangling FKs of one entity (those with none are left out)'''
+        return {f:n for f,n in self.dangling.get(name,{}).items() if n}
+
+def query(schema : Schema, ent : str) -> str:
+    '''
+    One anti-join of an entity with the targets of all its FKs (left joins on
+    their ids, which are unique, so the entity is scanned once): a FK dangles
+    wherever its target has no row. Backticks are understood by SQLite too.
+    '''
+    e      = schema[ent]
+    joins  = ['LEFT JOIN `{t}` `_r{i}` ON `_r{i}`.`{id}` = `_e`.`{fk}`'.format(
+                    i = i, t = fk.tar, id = schema[fk.tar].idname, fk = fk.name)
+                for i,fk in enumerate(e.fks.values())]
+    counts = ['COALESCE(SUM(`_r{0}`.`{1}` IS NULL),0)'.format(i, schema[fk.tar].idname)
+                for i,fk in enumerate(e.fks.values())]
+    return 'SELECT %s FROM `%s` `_e` %s'%(', '.join(counts), ent, ' '.join(joins))
+
+def check(conn : Any, schema : Schema) -> Integrity:
+    '''Count the dangling FKs of every entity of a schema in a database'''
+    out = {} # type: D[str,D[str,int]]
+    cur = conn.cursor()
+    with stage('integrity check'):
+        for en,e in schema.entities.items():
+            if not e.fks: continue
+            cur.execute(query(schema, en))
+            row = cur.fetchone()
+            out[en] = {f:int(n) for f,n in zip(e.fks, row)}
+    return Integrity(out)
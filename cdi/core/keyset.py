@@ -0,0 +1,63 @@
+# External
+from typing  import (Any,
+                     List     as L,
+                     Dict     as D)
+from sqlite3 import Connection as SQLite
+
+# Internal
+from cdi.core.exposed import Entity
+################################################################################
+'''
+Splitting the landing of large tables into chunks of consecutive ids, so that
+CQL never fetches a whole table through a single JDBC query (see Land.insts).
+
+Chunk boundaries are found by keyset pagination on a local stand-in of the
+source database (e.g. a SQLite copy or sample of it): each boundary is found by
+seeking past the previous one in the id index, rather than by an OFFSET from the
+start of the table.
+
+Likewise, the entities can be split into groups of about as many records, which
+are landed by separate import_jdbc instances (see Land.insts).
+'''
+
+def bounds(conn : SQLite, ent : Entity, size : int) -> L[Any]:
+    '''
+    Ids at which the records of an entity are split into chunks of `size`
+    records (as in the stand-in): the first id of each chunk but the first
+    '''
+    assert size > 0, 'Chunks must contain at least one record'
+    q   = 'SELECT "{0}" FROM "{1}" {2} ORDER BY "{0}" LIMIT 1 OFFSET ?'
+    out = [] # type: L[Any]
+    row = conn.execute(q.format(ent.idname, ent.name, ''), (size,)).fetchone()
+    while row is not None:
+        out.append(row[0])
+        row = conn.execute(q.format(ent.idname, ent.name, 'WHERE "%s" > ?'%ent.idname),
+                           (row[0], size - 1)).fetchone()
+    return out
+
+def keysets(conn : SQLite, sizes : D[Entity,int]) -> D[Entity,L[Any]]:
+    '''
+    Chunk boundaries of several entities, given the number of records per
+    chunk for each one (e.g. CQL(..., chunks1 = keysets(standin, {atoms : 10**6}))
+    '''
+    return {e : bounds(conn, e, n) for e,n in sizes.items()}
+
+def rows(conn : SQLite, ents : L[Entity]) -> D[Entity,int]:
+    '''Number of records of each entity (in the stand-in)'''
+    return {e : conn.execute('SELECT COUNT(*) FROM "%s"'%e.name).fetchone()[0]
+                for e in ents}
+
+def partition(sizes : D[Entity,int], n : int) -> L[L[Entity]]:
+    '''
+    Entities split into (at most) n groups with about the same total number of
+    records: the largest entities first, each into the smallest group so far
+    (e.g. CQL(..., groups1 = partition(rows(standin, ents), 4)))
+    '''
+    assert n > 0, 'There must be at least one group'
+    groups = [[] for _ in range(n)] # type: L[L[Entity]]
+    totals = [0] * n
+    for e in sorted(sizes, key = lambda e: (-sizes[e], e.name)):
+        i = totals.index(min(totals))
+        groups[i].append(e)
+        totals[i] += sizes[e]
+    return [g for g in groups if g]
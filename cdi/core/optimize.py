@@ -0,0 +1,252 @@
+# External
+from typing import (Any, cast,
+                    List     as L,
+                    Dict     as D,
+                    Tuple    as T,
+                    Optional as O,
+                    Iterator as I,
+                    Callable as C)
+from collections import Counter
+from re     import compile
+
+# Internal
+from cdi.core.utils import Base, Fn
+from cdi.core.expr  import (Expr, Agg, Binary, Nary, COUNT, COALESCE, SUBSELECT, Literal,
+                            AND, And, OR, CONCAT, PLUS, MINUS, MUL, DIV, POW,
+                            ABS, SQRT, SUM, AVG, STD, LEN)
+################################################################################
+'''
+Rewrites of the SQL expressions used to land data (see Land.makeSQL) into
+equivalent ones which are cheaper for the source database to evaluate
+'''
+
+def _with(e : Expr, **fields : Any) -> Expr:
+    '''Copy of a node with some fields replaced (whatever its constructor)'''
+    out = object.__new__(type(e))
+    out.__dict__.update(e._state(), **fields)
+    return out
+
+def _map(e : Any, f : C[[Any],Any]) -> Any:
+    '''A node with f applied to its children (itself, if none changed)'''
+    if isinstance(e, (list,tuple)):
+        xs = [f(x) for x in e]
+        return e if all(x is y for x,y in zip(xs,e)) else type(e)(xs)
+    elif isinstance(e, Expr):
+        state = e._state()
+        new   = {k:f(v) for k,v in state.items() if isinstance(v,(Expr,list,tuple))}
+        return e if all(v is state[k] for k,v in new.items()) else _with(e,**new)
+    return e
+
+def substitute(e : Any, f : C[[Any],O[Any]]) -> Any:
+    '''
+    Copy of an expression tree in which every node x for which f(x) is not
+    None is replaced by f(x). Unchanged subtrees are shared, not copied.
+    '''
+    new = f(e)
+    return _map(e, lambda x: substitute(x,f)) if new is None else new
+
+def nodes(e : Any, inner : bool = True) -> I[Expr]:
+    '''
+    All nodes of an expression tree, parents before their children (not
+    those inside subselects, which are about other tables, unless `inner`)
+    '''
+    if isinstance(e, Expr):
+        yield e
+        if inner or not isinstance(e, SUBSELECT):
+            for x in e.fields(): yield from nodes(x, inner)
+
+class Column(Expr):
+    '''A column of a table in the FROM clause, e.g. of a GroupJoin'''
+    def __init__(self, table : str, name : str) -> None:
+        self.table = table
+        self.name  = name
+
+    def fields(self) -> L[Expr]: return []
+
+    def show(self, _ : Fn) -> str:
+        return '`%s`.`%s`'%(self.table,self.name)
+
+class GroupJoin(Base):
+    '''
+    Derived table with one row per value of a key column of some table, and
+    aggregates of that table's records with that value, left joined to the
+    table being landed (so its records without any still have NULLs). With a
+    chunk (lowest key, key after the last: None means unbounded), only the
+    records whose key is in it are aggregated.
+    '''
+    def __init__(self, name : str, tab : str, key : str, outer : str,
+                 aggs : L[Agg] = None, chunk : T[Any,Any] = (None,None)) -> None:
+        self.name  = name
+        self.tab   = tab   # table (with an alias, possibly)
+        self.key   = key   # column of tab
+        self.outer = outer # column of the landed table it is equated with
+        self.aggs  = aggs or []
+        self.chunk = chunk
+
+    def __str__(self) -> str:
+        return 'GroupJoin<%s: %s>'%(self.name,self.tab)
+
+    def column(self, agg : Agg) -> Expr:
+        '''Column with the value of an aggregate (added to this table if new)'''
+        same = [i for i,a in enumerate(self.aggs) if type(a) == type(agg) and a == agg]
+        if not same: self.aggs.append(agg)
+        col  = Column(self.name,'%s_%d'%(self.name,same[0] if same else len(self.aggs)-1))
+        # COUNT of no records is 0, but a missing row of the join is NULL
+        return COALESCE(col,Literal(0)) if isinstance(agg,COUNT) else col
+
+    def show(self, f : Fn) -> str:
+        cols = ['%s AS `%s_%d`'%(f(a),self.name,i) for i,a in enumerate(self.aggs)]
+        lower,upper = self.chunk
+        where = ([] if lower is None else ['%s >= %s'%(self.key,f(Literal(lower)))]) \
+              + ([] if upper is None else ['%s < %s'%(self.key,f(Literal(upper)))])
+        return 'LEFT JOIN (SELECT {key} AS `{name}_key`, {cols} FROM {tab}{where} GROUP BY {key}) '\
+               'AS `{name}` ON `{name}`.`{name}_key` = {outer}'.format(
+                    key = self.key, name = self.name, cols = ', '.join(cols),
+                    tab = self.tab, outer = self.outer,
+                    where = ' WHERE ' + ' AND '.join(where) if where else '')
+
+# "table", "table alias" or "table AS alias"
+_tab = compile(r'^\s*(\w+)(?:\s+(?:[aA][sS]\s+)?(\w+))?\s*$')
+# "[x.]col = y.col"
+_eq  = compile(r'^\s*(?:(\w+)\.)?(\w+)\s*=\s*(?:(\w+)\.)?(\w+)\s*$')
+
+def correlation(table : str, sub : SUBSELECT) -> O[T[str,str,str]]:
+    '''
+    (inner table, its key column, column of `table`), if a SUBSELECT is an
+    aggregate of the records of a table whose key equals a column of `table`
+    (the record being landed), e.g.
+        SELECT GROUP_CONCAT(x) FROM atoms WHERE structure_id = structures.id
+    '''
+    t,eq = _tab.match(sub.tab), _eq.match(sub.where)
+    if not (t and eq and isinstance(sub.expr,Agg)): return None
+    inner = t.group(2) or t.group(1) # how the subselect's table is referred to
+    if inner == table: return None   # the outer table is shadowed
+    q1,c1,q2,c2 = eq.groups()
+    for qi,ci,qo,co in [(q1,c1,q2,c2),(q2,c2,q1,c1)]:
+        if qo == table and qi in (None,inner):
+            return sub.tab, '%s.%s'%(qi,ci) if qi else ci, '%s.%s'%(table,co)
+    return None
+
+def unnest(table : str, exprs : L[Expr], chunk : T[Any,Any] = (None,None),
+           id : str = 'id') -> T[L[Expr],L[GroupJoin]]:
+    '''
+    Replace the correlated aggregate subselects in expressions evaluated for
+    each record of a table (which the database would run once per record) by
+    columns of GroupJoins: one aggregation over the whole inner table. All
+    aggregates with the same correlation share a GroupJoin (one scan).
+
+    If only the records of the table whose `id` column is in a chunk are
+    evaluated (see LandObj.chunks), only subselects correlated with that column
+    are replaced, by GroupJoins of the inner records in the same chunk: any
+    other would aggregate the whole inner table once per chunk.
+    '''
+    joins   = {} # type: D[T[str,str,str],GroupJoin]
+    chunked = chunk != (None,None)
+    def f(x : Any) -> O[Expr]:
+        if not isinstance(x,SUBSELECT): return None
+        c = correlation(table,x)
+        if c is None or chunked and c[2] != '%s.%s'%(table,id): return None
+        if c not in joins: joins[c] = GroupJoin('_g%d'%len(joins),*c,chunk = chunk)
+        return joins[c].column(cast(Agg,x.expr)) # (correlation checks it is one)
+    return [substitute(e,f) for e in exprs], list(joins.values())
+
+################################################################################
+# Simplification
+
+# Nodes whose value is always a number (None if they are, e.g. for NULL inputs)
+_numeric = (PLUS, MINUS, MUL, DIV, POW, ABS, SQRT, SUM, AVG, STD, COUNT, LEN)
+
+def numeric(e : Expr) -> bool:
+    return isinstance(e,_numeric) or isinstance(e,Literal) \
+                and isinstance(e.x,(int,float)) and not isinstance(e.x,bool)
+
+def _int(e : Any) -> bool:
+    return isinstance(e,Literal) and type(e.x) == int
+
+def _truth(e : Any) -> O[bool]:
+    '''Truth value of a numeric literal (None for anything else)'''
+    return bool(e.x) if numeric(e) and isinstance(e,Literal) else None
+
+def _rule(e : Expr) -> Expr:
+    '''Simplify a node whose children are already simplified'''
+    t = type(e)
+    if t in (AND, And, OR, CONCAT, COALESCE) and isinstance(e, Nary):
+        # flatten: associative (with NULLs too), so nesting is irrelevant
+        xs = [] # type: L[Expr]
+        for x in e.xs: xs.extend(x.xs if type(x) == t and isinstance(x, Nary) else [x])
+
+        if t in (AND, And, OR):
+            absorb = t is OR # 0 AND .. = 0,  1 OR .. = 1
+            if any(_truth(x) is absorb for x in xs): return Literal(int(absorb))
+            # identities, as long as two terms remain (x AND 1 is 0/1, not x)
+            rest = [x for x in xs if _truth(x) is not (not absorb)]
+            if len(rest) >= 2: xs = rest
+        elif t is CONCAT:
+            # adjacent string literals
+            ys = [] # type: L[Expr]
+            for x in xs:
+                last = ys[-1] if ys else None
+                if isinstance(last,Literal) and isinstance(x,Literal) \
+                        and isinstance(last.x,str) and isinstance(x.x,str):
+                    ys[-1] = Literal(last.x + x.x)
+                else:
+                    ys.append(x)
+            xs = ys
+        same = len(xs) == len(e.xs) and all(x is y for x,y in zip(xs,e.xs))
+        return e if same else _with(e, xs = xs)
+
+    if t in (PLUS, MINUS, MUL) and isinstance(e, Binary):
+        x,y = e.x,e.y
+        lx  = x.x if _int(x) and isinstance(x,Literal) else None # integer values
+        ly  = y.x if _int(y) and isinstance(y,Literal) else None
+        if lx is not None and ly is not None: # exact, unlike DIV, POW or floats (MySQL decimals)
+            return Literal(lx + ly if t is PLUS else lx - ly if t is MINUS else lx * ly)
+        # identities only for numbers: in MySQL, 0 + 'abc' is 0, not 'abc'
+        unit = 1 if t is MUL else 0
+        if numeric(y) and lx == unit and t is not MINUS: return y
+        if numeric(x) and ly == unit:                    return x
+    return e
+
+def simplify(e : Any) -> Any:
+    '''
+    Fold constants, flatten nested AND/OR/CONCAT/COALESCE and drop identity
+    terms (e.g. the 0 which Sum starts with) of an expression, bottom-up.
+    Only rewrites which give the same value in MySQL, for any input.
+    '''
+    return _rule(_map(e, simplify)) if isinstance(e, Expr) else _map(e, simplify)
+
+################################################################################
+# Common subexpressions
+
+def hoistable(e : Expr) -> bool:
+    '''
+    Whether an expression can be computed in a derived table of the landed
+    table: not a mere column or constant, and with no aggregates, subselects
+    or columns of other tables
+    '''
+    from cdi.core.classes import Ref # (it depends on this module)
+    return not isinstance(e,(Ref,Literal,Column)) and \
+           not any(isinstance(x,(Agg,SUBSELECT,Column)) for x in nodes(e))
+
+def hoist(table : str, exprs : L[Expr]) -> T[L[Expr],D[str,Expr]]:
+    '''
+    Expressions which occur more than once (as subexpressions of the ones
+    given) are replaced by columns of the landed table, so that they can be
+    computed once per record (see Land.makeSQL). The maximal ones are hoisted:
+    the REPLACE chain shared by several JSON_EXTRACTs, not its innermost
+    REPLACE. Returns the new expressions and {column : expression}.
+    Subselects are left as they are: what is inside them is evaluated for the
+    records of another table.
+    '''
+    counts = Counter(str(x) for e in exprs for x in nodes(e, inner = False)) # type: Counter
+    cols   = {} # type: D[str,str]
+    defs   = {} # type: D[str,Expr]
+    def f(x : Any) -> O[Expr]:
+        if isinstance(x,SUBSELECT): return x # (not descended into)
+        if not isinstance(x,Expr) or counts[str(x)] < 2 or not hoistable(x): return None
+        key = str(x)
+        if key not in cols:
+            cols[key] = '_c%d'%len(cols)
+            defs[cols[key]] = x
+        return Column(table,cols[key])
+    return [substitute(e,f) for e in exprs], defs
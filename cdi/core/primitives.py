@@ -9,9 +9,9 @@ from typing import (Any,
                     Callable as C)
 from abc         import ABCMeta,abstractmethod
 from collections import defaultdict
-from itertools   import chain
+from re          import compile
 # Internal
-from cdi.core.utils import Base,Conn, Showable, Fn, merge_dicts
+from cdi.core.utils import Base,Compact,Conn, Showable, Fn, merge_dicts
 
 '''
 Primitive datatypes which appear in an CQL file
@@ -29,6 +29,23 @@ nnt = '\n\n\t'.join
 nttt = '\n\t\t\t'.join
 nntt = '\n\n\t\t'.join
 
+# A string literal (kept as is) or a comment (dropped), for minify
+_literal = compile(r'("(?:[^"\\]|\\.)*")|//[^\n]*')
+_stashed = compile('\0([0-9]+)\0')
+
+def minify(text : str) -> str:
+    '''
+    Rendered CQL with minimal whitespace: comments are dropped and every run of
+    whitespace becomes a single space, except within string literals
+    '''
+    lits = [] # type: L[str]
+    def stash(m : Any) -> str: # set string literals aside, drop comments
+        if m.group(1) is None: return ' '
+        lits.append(m.group(1))
+        return '\0%d\0'%(len(lits)-1)
+    code = ' '.join(_literal.sub(stash, text).split())
+    return _stashed.sub(lambda m: lits[int(m.group(1))], code) if lits else code
+
 class CQLSection(Base, metaclass = ABCMeta):
     '''Class for things that appear in the CQL file outline'''
     @abstractmethod
@@ -65,7 +82,8 @@ class Options(CQLSection):
         if isinstance(x,str):   return '"%s"'%x
         else:                   return str(x)
 
-class Type(Base):
+class Type(Compact):
+    __slots__ = ('name',)
     def __init__(self, name : str) -> None:
         self.name = name
     def __str__(self) -> str:
@@ -134,7 +152,8 @@ class Typeside(CQLSection):
 
 sql = Typeside('sql') # builtin typeside
 
-class Attr(Base):
+class Attr(Compact):
+    __slots__ = ('name','ent','dtype')
     def __init__(self, name : str, ent : str, dtype : str) -> None:
         self.name  = name
         self.ent   = ent
@@ -148,7 +167,8 @@ class Attr(Base):
         args = [self.name,self.ent,self.dtype,des]
         return '{} : {} -> {} {}'.format(*args)
 
-class FK(Base):
+class FK(Compact):
+    __slots__ = ('name','src','tar')
     def __init__(self, name : str, src : str, tar : str) -> None:
         self.name = name
         self.src  = src
@@ -181,6 +201,7 @@ class Entity(Base):
 
 ################################################################################
 class Expr(Showable, metaclass = ABCMeta):
+    __slots__ = ()
 
     def __str__(self)->str:
         return 'CQLExpr<%s>'%self.show(str)
@@ -204,10 +225,11 @@ class Eq(Expr):
     def dtype(self)->str:
         return 'Boolean'
 
-class JLit(Expr):
+class JLit(Expr,Compact):
     '''
     A literal used in a Java expression (must be typed)
     '''
+    __slots__ = ('lit','_dtype')
 
     def __init__(self, lit : str, dtype:str)->None:
         self.lit   = lit
@@ -217,7 +239,9 @@ class JLit(Expr):
         return self.show(str)
 
     def __eq__(self,other:object)->bool:
-        return vars(self)==vars(other)
+        return self._state()==other._state() # type: ignore
+
+    __hash__ = Compact.__hash__ # (defining __eq__ unsets it)
 
     @property
     def dtype(self)->str: return self._dtype
@@ -358,12 +382,12 @@ class Schema(CQLSection):
                 if self.imports else ''
         e  = (sect % 'entities' + ntt([x.show(self.ent_desc.get(x.name)) for x in self.entities.values()])) \
                 if self.entities else ''
-        f  = (sect % 'foreign_keys') + ntt([fk.show(self.col_desc[fk.src].get(fk.name)) for fk in self.fks])\
+        f  = (sect % 'foreign_keys') + ntt([fk.show(self.col_desc.get(fk.src,{}).get(fk.name)) for fk in self.fks])\
                 if self.fks else ''
 
         pe = (sect % 'path_equations' + ntt([str(pe) for pe in self.pes])) \
                 if self.pes else ''
-        at = (sect % 'attributes' + ntt([a.show(self.col_desc[a.ent].get(a.name)) for a in self.attrs])) \
+        at = (sect % 'attributes' + ntt([a.show(self.col_desc.get(a.ent,{}).get(a.name)) for a in self.attrs])) \
                 if self.attrs else ''
 
         oe = sect % 'observation_equations' + ntt([oe.show(ObsEQ.renderObs) for oe in self.oes]) \
@@ -373,8 +397,13 @@ class Schema(CQLSection):
         return 'schema {} = literal : {} {{ {} \n}}'.format(*args)
 
     def all_entities(self) -> D[str, Entity]:
+        '''Entities of this schema and (recursively) its imports'''
         return merge_dicts([self.entities] + [i.all_entities() for i in self.imports])
 
+    def obj_names(self) -> D[str, S[str]]:
+        '''Names of the attributes and FKs of each entity in all_entities'''
+        return {en:e.attrs.keys() | e.fks.keys() for en,e in self.all_entities().items()}
+
     def rewrite_dict(self, overlap:D[str,str], left : 'Schema') -> D[str,T[str,S[str]]]:
         '''
         Data structure needed for re-writing path equations after a schema
@@ -383,11 +412,8 @@ class Schema(CQLSection):
         element of the tuple) and what attributes are held in common (these will
         need to be prefixed)
         '''
-        es,les = self.all_entities(),left.all_entities()
-        out = {k:(v,{a for a in chain(es[k].attrs,es[k].fks)
-                    if a in chain(les[v].attrs,les[v].fks)})
-            for k,v in overlap.items()}
-        return out
+        ns,lns = self.obj_names(),left.obj_names()
+        return {k:(v,ns[k] & lns[v]) for k,v in overlap.items()}
 
 class Mapping(CQLSection, metaclass = ABCMeta):
     name = '???'
@@ -593,7 +619,8 @@ class SchemaColimitQuotient(SchemaColimit):
     def name(self)->str: return self._name
 
 
-class GenAttr(Expr):
+class GenAttr(Expr,Compact):
+    __slots__ = ('name','gen','_dtype')
     def __init__(self,
                  name   : str,
                  dtype  : str,
@@ -613,7 +640,8 @@ class GenAttr(Expr):
     def dtype(self) -> str: return self._dtype
 
 
-class Gen(Base):
+class Gen(Compact):
+    __slots__ = ('name','ent')
     def __init__(self, name : str, ent : str) -> None:
         self.name = name
         self.ent  = ent
@@ -867,14 +895,16 @@ class Command(CQLSection, metaclass = ABCMeta):
         return 'command {} = {}'.format(self.name,self.print())
 
 class Exec(Command):
-    def __init__(self, name : str, conn : Conn, sql : str, db : bool = True) -> None:
+    '''SQL statement(s), executed in order over one connection'''
+    def __init__(self, name : str, conn : Conn, sql : U[str,L[str]], db : bool = True) -> None:
         self.name  = name
         self.conn  = conn
         self.sql   = sql
         self.db    = db
     def print(self) -> str:
-        args = [self.conn.jdbc(self.db),self.sql]
-        return 'exec_jdbc "{}" {{"{}"}}'.format(*args)
+        sqls = [self.sql] if isinstance(self.sql,str) else self.sql
+        args = [self.conn.jdbc(self.db),' '.join('"%s"'%x for x in sqls)]
+        return 'exec_jdbc "{}" {{{}}}'.format(*args)
 
 class Export(Command):
     def __init__(self, name : str, conn : Conn, inst : Instance) -> None:
@@ -0,0 +1,262 @@
+# External
+from typing  import (Any,
+                     List     as L,
+                     Dict     as D,
+                     Tuple    as T,
+                     Optional as O)
+from os      import makedirs, replace, getpid
+from os.path import join, exists
+from json    import dumps, load
+from re      import match
+from hashlib import sha1
+from warnings import warn
+from sqlite3 import Connection as SQLite
+
+# Internal
+from cdi.core.utils   import Base, digest, stage
+from cdi.core.exposed import (Schema, Entity, Attr, FK, DType, Int, Tinyint,
+                              Bigint, Varchar, Text, Double, Date, Boolean)
+################################################################################
+'''
+Building exposed Schemas from the catalog of a database (SQLite, or MySQL via
+any DB-API connection), instead of writing them by hand
+'''
+
+# SQL type name -> DType (names not found here fall back on SQLite's affinity rules)
+dtypes = {
+    'int'       : Int,     'integer'   : Int,    'smallint' : Int,
+    'mediumint' : Int,     'tinyint'   : Tinyint,'bigint'   : Bigint,
+    'bool'      : Boolean, 'boolean'   : Boolean,'bit'      : Boolean,
+    'char'      : Varchar, 'varchar'   : Varchar,'enum'     : Varchar,
+    'text'      : Text,    'tinytext'  : Text,   'mediumtext' : Text,
+    'longtext'  : Text,    'json'      : Text,   'clob'     : Text,
+    'float'     : Double,  'double'    : Double, 'real'     : Double,
+    'decimal'   : Double,  'numeric'   : Double,
+    'date'      : Date,    'datetime'  : Date,   'timestamp': Date,
+} # type: D[str,DType]
+
+def dtype(sqltype : str) -> DType:
+    '''The DType of a column, given its declared SQL type, e.g. "varchar(255)"'''
+    m    = match(r'\s*([a-zA-Z]+)', sqltype)
+    name = m.group(1).lower() if m else ''
+    if name in dtypes:                          return dtypes[name]
+    t = sqltype.lower()
+    if 'int' in t:                              return Int
+    if any(x in t for x in ['real','floa','doub']): return Double
+    return Varchar
+
+class Catalog(Base):
+    '''
+    Everything reflection needs from the catalog of a database, as plain rows
+    (in the order the database lists them):
+
+    columns - (table, column, SQL type, position in the primary key, or 0)
+    fks     - (table, constraint, column, referenced table)
+    keys    - (table, index, column) of the unique indexes (not the primary key)
+    '''
+    def __init__(self,
+                 columns : L[T[str,str,str,int]],
+                 fks     : L[T[str,str,str,str]],
+                 keys    : L[T[str,str,str]]
+                ) -> None:
+        # (rows may be lists, e.g. when read back from JSON)
+        self.columns = [(t,c,ty,pk) for t,c,ty,pk in columns]
+        self.fks     = [(t,k,c,r)   for t,k,c,r   in fks]
+        self.keys    = [(t,i,c)     for t,i,c     in keys]
+
+    def __str__(self) -> str:
+        tables = {r[0] for r in self.columns}
+        return 'Catalog<%d tables, %d columns>'%(len(tables),len(self.columns))
+
+    def json(self) -> str:
+        return dumps(dict(columns = self.columns, fks = self.fks, keys = self.keys))
+
+    def schema(self, name : str, idnames : D[str,str] = None) -> Schema:
+        '''
+        One entity per table:
+         - a single column primary key is its id, unless idnames ({table :
+           column}) gives another column (other primary keys only mark their
+           columns as identifying attributes)
+         - tables with neither are skipped, with a warning: a landed entity
+           needs a column identifying its records
+         - single column FKs become FKs (unless the table they refer to is not
+           an entity); those of composite FKs stay attributes
+         - the columns of its first unique index are identifying
+        '''
+        idnames = idnames or {}
+        cols  = {} # type: D[str,L[T[str,str,int]]]
+        for t,c,ty,pk in self.columns: cols.setdefault(t,[]).append((c,ty,pk))
+
+        pks   = {t:sorted((pk,c) for c,_,pk in cs if pk) for t,cs in cols.items()}
+        ents  = {t:idnames.get(t) or (pks[t][0][1] if len(pks[t]) == 1 else '')
+                    for t in cols} # type: D[str,str]
+        for t in [t for t,i in ents.items() if not i]:
+            warn('table %s has no single column primary key: skipped (give its id in idnames)'%t)
+            del ents[t]
+
+        fkcols = {} # type: D[T[str,str],L[T[str,str]]]
+        for t,k,c,r in self.fks: fkcols.setdefault((t,k),[]).append((c,r))
+        fks = {(t,c):r for (t,_),cs in fkcols.items() if len(cs) == 1
+                        for c,r in cs if r in ents} # type: D[T[str,str],str]
+
+        unique = {} # type: D[str,D[str,L[str]]]
+        for t,i,c in self.keys: unique.setdefault(t,{}).setdefault(i,[]).append(c)
+        ids = {t:set(ixs[min(ixs)]) for t,ixs in unique.items()}
+
+        out = [] # type: L[Entity]
+        for t,idname in ents.items():
+            key = ids.get(t,set())
+            if len(pks[t]) > 1: key = key | {c for _,c in pks[t]}
+
+            attrs,refs = [], [] # type: T[L[Attr],L[FK]]
+            for c,ty,_ in cols[t]:
+                if (t,c) in fks:
+                    refs.append(FK(c, fks[(t,c)], id = c in key))
+                elif c != idname or dtype(ty) != Int:
+                    attrs.append(Attr(c, dtype(ty), id = c in key))
+            out.append(Entity(t, attrs = attrs, fks = refs, id = idname))
+        return Schema(name, out)
+
+################################################################################
+# Reading catalogs: a fixed number of queries, however many tables there are
+
+def sqlite_catalog(conn : SQLite) -> Catalog:
+    tables = "FROM sqlite_master m %s WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%%'"
+    columns = conn.execute('SELECT m.name, p.name, p.type, p.pk ' +
+        tables%'JOIN pragma_table_info(m.name) p' + ' ORDER BY m.name, p.cid')
+    fks     = conn.execute('SELECT m.name, f.id, f."from", f."table" ' +
+        tables%'JOIN pragma_foreign_key_list(m.name) f' + ' ORDER BY m.name, f.id, f.seq')
+    keys    = conn.execute('SELECT m.name, l.name, i.name ' +
+        tables%'JOIN pragma_index_list(m.name) l JOIN pragma_index_info(l.name) i' +
+        ' AND l."unique" AND l.origin != \'pk\' ORDER BY m.name, l.name, i.seqno')
+    return Catalog(*[q.fetchall() for q in [columns,fks,keys]])
+
+def mysql_catalog(conn : Any, db : str) -> Catalog:
+    '''Catalog of database `db`, from a (DB-API) connection to a MySQL server'''
+    queries = [
+        '''SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, COALESCE(k.ORDINAL_POSITION,0)
+           FROM information_schema.COLUMNS c LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+             ON k.TABLE_SCHEMA = c.TABLE_SCHEMA AND k.TABLE_NAME = c.TABLE_NAME
+            AND k.COLUMN_NAME = c.COLUMN_NAME AND k.CONSTRAINT_NAME = 'PRIMARY'
+           WHERE c.TABLE_SCHEMA = %s ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION''',
+        '''SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME
+           FROM information_schema.KEY_COLUMN_USAGE
+           WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL
+           ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION''',
+        '''SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+           WHERE TABLE_SCHEMA = %s AND NON_UNIQUE = 0 AND INDEX_NAME != 'PRIMARY'
+           ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX''']
+    cur = conn.cursor()
+    out = [] # type: L[L[Any]]
+    for q in queries:
+        cur.execute(q, (db,))
+        out.append(list(cur.fetchall()))
+    return Catalog(*out)
+
+def indexes(conn : Any, db : str = '') -> D[str,L[L[str]]]:
+    '''
+    Columns of every index of every table (including primary keys, and unique
+    or not), in order: {table : [[column]]}
+    '''
+    rows = [] # type: L[Any]
+    if isinstance(conn, SQLite):
+        pks  = conn.execute("SELECT m.name, 'pk', p.name FROM sqlite_master m "
+            "JOIN pragma_table_info(m.name) p WHERE m.type = 'table' AND p.pk ORDER BY m.name, p.pk")
+        ixs  = conn.execute("SELECT m.name, l.name, i.name FROM sqlite_master m "
+            "JOIN pragma_index_list(m.name) l JOIN pragma_index_info(l.name) i "
+            "WHERE m.type = 'table' ORDER BY m.name, l.name, i.seqno")
+        rows = pks.fetchall() + ixs.fetchall()
+    else:
+        cur = conn.cursor()
+        cur.execute('''SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+                       WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX''', (db,))
+        rows = list(cur.fetchall())
+    out = {} # type: D[str,D[str,L[str]]]
+    for t,i,c in rows: out.setdefault(t,{}).setdefault(i,[]).append(c)
+    return {t:list(ixs.values()) for t,ixs in out.items()}
+
+def catalog(conn : Any, db : str = '') -> Catalog:
+    return sqlite_catalog(conn) if isinstance(conn, SQLite) else mysql_catalog(conn, db)
+
+def fingerprint(conn : Any, db : str = '') -> str:
+    '''
+    Digest of the definitions of all tables, with their keys, foreign keys and
+    indexes (everything a Catalog is read from), in one cheap query: it changes
+    whenever the schema does (not the data)
+    '''
+    rows = [] # type: L[Any]
+    if isinstance(conn, SQLite): # (the sql of tables includes their foreign keys)
+        rows = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    else:
+        cur = conn.cursor()
+        cur.execute('''SELECT COUNT(*), SUM(CRC32(CONCAT_WS(',',TABLE_NAME,COLUMN_NAME,
+                              COLUMN_TYPE,COLUMN_KEY))) FROM information_schema.COLUMNS
+                       WHERE TABLE_SCHEMA = %s
+                       UNION ALL
+                       SELECT COUNT(*), SUM(CRC32(CONCAT_WS(',',TABLE_NAME,CONSTRAINT_NAME,
+                              COLUMN_NAME,ORDINAL_POSITION,REFERENCED_TABLE_NAME,
+                              REFERENCED_COLUMN_NAME))) FROM information_schema.KEY_COLUMN_USAGE
+                       WHERE TABLE_SCHEMA = %s
+                       UNION ALL
+                       SELECT COUNT(*), SUM(CRC32(CONCAT_WS(',',TABLE_NAME,CONSTRAINT_NAME,
+                              REFERENCED_TABLE_NAME,UNIQUE_CONSTRAINT_NAME)))
+                       FROM information_schema.REFERENTIAL_CONSTRAINTS
+                       WHERE CONSTRAINT_SCHEMA = %s
+                       UNION ALL
+                       SELECT COUNT(*), SUM(CRC32(CONCAT_WS(',',TABLE_NAME,INDEX_NAME,NON_UNIQUE,
+                              SEQ_IN_INDEX,COLUMN_NAME))) FROM information_schema.STATISTICS
+                       WHERE TABLE_SCHEMA = %s''', (db,)*4)
+        rows = list(cur.fetchall())
+    return digest([list(r) for r in rows])
+
+def content_fingerprint(conn : Any, db : str = '', tables : L[str] = None) -> str:
+    '''
+    Digest of the content of some tables (by default, all of them) and of the
+    definitions of all, e.g. for the staging tables of a Land: unlike
+    fingerprint, it changes whenever a record is inserted, updated or deleted.
+    MySQL computes CHECKSUM TABLE, a scan of each table; SQLite has no such
+    thing, so its records are read and digested here.
+    '''
+    h = sha1(fingerprint(conn, db).encode())
+    if isinstance(conn, SQLite):
+        if tables is None:
+            tables = [t for t, in conn.execute("SELECT name FROM sqlite_master "
+                        "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        for t in tables: # (in any order: not every table has a rowid)
+            h.update(('\0%s\0'%t).encode())
+            for r in sorted(map(repr, conn.execute('SELECT * FROM "%s"'%t))):
+                h.update(r.encode())
+    else:
+        cur = conn.cursor()
+        if tables is None:
+            cur.execute('''SELECT TABLE_NAME FROM information_schema.TABLES
+                           WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME''', (db,))
+            tables = [t for t, in cur.fetchall()]
+        if tables:
+            cur.execute('CHECKSUM TABLE ' + ', '.join('`%s`.`%s`'%(db,t) if db else '`%s`'%t
+                                                     for t in tables))
+            h.update(repr(list(cur.fetchall())).encode())
+    return h.hexdigest()
+
+def reflect(conn : Any, name : str, db : str = '', cache : O[str] = None,
+            idnames : D[str,str] = None) -> Schema:
+    '''
+    Exposed Schema (named `name`) of the tables in a database. If a cache
+    directory is given, the catalog is stored there, keyed by the fingerprint
+    of the database, and only read again when the tables have changed. See
+    Catalog.schema for idnames.
+    '''
+    if cache is None:
+        with stage('reflect catalog'): return catalog(conn, db).schema(name, idnames)
+
+    makedirs(cache, exist_ok = True)
+    with stage('reflect fingerprint'): fp = fingerprint(conn, db)
+    file = join(cache, '%s-%s.json'%(name, fp))
+    if exists(file):
+        with open(file) as f: cat = Catalog(**load(f))
+    else:
+        with stage('reflect catalog'): cat = catalog(conn, db)
+        tmp = '%s.%d.tmp'%(file, getpid())
+        with open(tmp,'w') as f: f.write(cat.json())
+        replace(tmp, file) # never leave a partly written entry behind
+    return cat.schema(name, idnames)
@@ -1,29 +1,61 @@
 from typing  import (Any, TypeVar,
                      List     as L,
                      Dict     as D,
+                     Tuple    as Tup,
+                     Optional as O,
+                     Iterator as I,
                      Callable as C)
-from abc       import ABCMeta,abstractmethod
-from os        import environ
-from copy      import deepcopy
+from abc         import ABCMeta,abstractmethod
+from os          import environ
+from copy        import deepcopy
+from collections import Counter
+from contextlib  import contextmanager, nullcontext
+from time        import perf_counter
+from sys         import getallocatedblocks
+from json        import dumps
+from hashlib     import sha1
+from functools   import wraps
 
 ################################################################################
 T = TypeVar('T')
 Fn = C[[Any],str] # type shortcut
 
 class Base(object):
+    '''
+    Equality and hashing are structural (based on the fields of an object).
+
+    Only the immutable Compact nodes cache their hash. Any other node computes
+    it from its fields on every call (its Compact children contribute cached
+    hashes), so no mutation of a node - including in-place edits of its
+    container fields, e.g. x.attrs[k] = v - can leave a stale hash behind.
+    '''
+    __slots__ = () # subclasses get a __dict__ unless they are Compact
+    _meta  = () # type: Tup[str,...] # bookkeeping fields, ignored by equality and hashing
+
     @abstractmethod
     def __str__(self)->str:
         raise NotImplementedError
     def __repr__(self) -> str:
         return str(self)
 
+    def _state(self) -> D[str,Any]:
+        '''The fields which determine equality and hashing'''
+        return {k:v for k,v in vars(self).items() if k not in self._meta}
+
+    def _values(self) -> L[Any]:
+        '''Field values, in the order they were assigned (by __init__)'''
+        return [v for k,v in vars(self).items() if k not in self._meta]
+
+    def _same(self, other : Any) -> bool:
+        '''Field comparison of two nodes of the same type'''
+        if not self._meta: return vars(self) == vars(other)
+        else:               return self._state() == other._state()
+
     def __eq__(self, other : Any) -> bool:
-        '''
-        Maybe the below should be preferred? Try it out, sometime!
-        return type(self) == type(other) and vars(self) == vars(other)
-        '''
-        if type(other) == type(self):
-            return vars(self) == vars(other)
+        if self is other:
+            return True
+        elif type(other) == type(self):
+            return self._same(other)
         else:
             args = [self,type(self),other,type(other)]
             raise ValueError('Equality type error \n{} \n({}) \n\n{} \n({})'.format(*args))
@@ -32,12 +64,328 @@ class Base(object):
         return str(self) < str(other)
 
     def __hash__(self) -> int:
-        return hash(str(vars(self)))
+        meta = self._meta
+        return hash((type(self).__name__,) + tuple([
+                        hash(v) if type(v) in _atoms else structhash(v)
+                            for k,v in vars(self).items() if k not in meta]))
 
     def copy(self : T) -> T:
         return deepcopy(self)
 
+def _memo(node : Any) -> D[str,Any]:
+    '''Results cached by once/compiled methods of a node'''
+    memo = vars(node).get('_derived')
+    if memo is None:
+        memo = {}
+        object.__setattr__(node, '_derived', memo)
+    return memo
+
+def once(f : C[[Any],T]) -> C[[Any],T]:
+    '''
+    Decorator for argument-less methods of Base nodes which are not modified
+    after __init__: the result is computed on first use and then kept. The
+    class must list '_derived' in its _meta fields.
+    '''
+    name = f.__name__
+    @wraps(f)
+    def get(self : Any) -> T:
+        memo = _memo(self)
+        if name not in memo: memo[name] = f(self)
+        return memo[name]
+    return get
+
+class CompileCounter(object):
+    '''How often each @compiled method did its work or reused an earlier result'''
+    def __init__(self) -> None:
+        self.compiled = Counter() # type: Counter
+        self.reused   = Counter() # type: Counter
+
+    def __str__(self) -> str:
+        return 'CompileCounter<%d compiled, %d reused>'%(
+                    sum(self.compiled.values()),sum(self.reused.values()))
+
+    def stats(self) -> D[str,Tup[int,int]]:
+        '''(compiled, reused) counts for each method'''
+        return {k:(self.compiled[k],self.reused[k])
+                    for k in sorted(set(self.compiled)|set(self.reused))}
+
+    def report(self) -> str:
+        rows = ['%-24s %6d compiled %6d reused'%(k,c,r)
+                    for k,(c,r) in self.stats().items()]
+        return '\n'.join(rows + [str(self)])
+
+    def clear(self) -> None:
+        self.compiled.clear(); self.reused.clear()
+
+compile_counter = CompileCounter()
+
+def compiled(f : C[[Any],T]) -> C[[Any],T]:
+    '''
+    Decorator for argument-less methods which compile a user-exposed node into
+    its internal representation. The result is reused for as long as the
+    node's structural hash (i.e. its content) is unchanged: any change to the
+    node or its children, including in-place edits, compiles it again.
+
+    Results are shared, so callers must not modify them (copy() them first).
+    The class must list '_derived' in its _meta fields.
+    '''
+    name = '%s.%s'%(f.__qualname__.split('.')[0], f.__name__)
+    @wraps(f)
+    def get(self : Any) -> T:
+        memo    = _memo(self)
+        version = hash(self)
+        hit     = memo.get(f.__name__)
+        if hit is not None and hit[0] == version:
+            compile_counter.reused[name] += 1
+            return hit[1]
+        compile_counter.compiled[name] += 1
+        with stage('compile '+name): val = f(self)
+        memo[f.__name__] = (version, val)
+        return val
+    return get
+
+class Profiler(object):
+    '''
+    Wall time, allocations (net change in allocated memory blocks) and output
+    size of the stages of generating a file (see profiling). Stages nest, and
+    each one's numbers include those of the stages inside it.
+
+    Only this process is measured: sections rendered by a pool of workers are
+    not attributed to their classes.
+    '''
+    fields = ('calls','seconds','blocks','bytes')
+
+    def __init__(self) -> None:
+        self.stages   = {} # type: D[str,L[Any]]
+        self.sections = {} # type: D[str,L[Any]]
+
+    def __str__(self) -> str:
+        return 'Profiler<%d stages, %d section types>'%(len(self.stages),len(self.sections))
+
+    @contextmanager
+    def stage(self, name : str, section : bool = False) -> I[None]:
+        row = (self.sections if section else self.stages).setdefault(name,[0,0.,0,0])
+        b0,t0 = getallocatedblocks(), perf_counter()
+        try:     yield
+        finally:
+            row[0] += 1
+            row[1] += perf_counter() - t0
+            row[2] += getallocatedblocks() - b0
+
+    def output(self, name : str, text : str, section : bool = False) -> None:
+        '''Count text produced by a stage'''
+        row = (self.sections if section else self.stages).setdefault(name,[0,0.,0,0])
+        row[3] += len(text.encode('utf-8'))
+
+    def report(self) -> D[str,D[str,D[str,Any]]]:
+        return {group : {k:dict(zip(self.fields,v)) for k,v in sorted(rows.items())}
+                    for group,rows in [('stages',self.stages),('sections',self.sections)]}
+
+    def json(self) -> str:
+        return dumps(self.report(), indent = 2)
+
+_profiler = None # type: O[Profiler]
+_unprofiled = nullcontext()
+
+@contextmanager
+def profiling() -> I[Profiler]:
+    '''Profile everything done within a block. Nested blocks share a Profiler'''
+    global _profiler
+    if _profiler is not None:
+        yield _profiler
+        return
+    _profiler = Profiler()
+    try:     yield _profiler
+    finally: _profiler = None
+
+def stage(name : str, section : bool = False) -> Any:
+    '''Context manager measuring a stage, if profiling (otherwise a no-op)'''
+    return _unprofiled if _profiler is None else _profiler.stage(name,section)
+
+def staged(f : C[...,T]) -> C[...,T]:
+    '''Decorator: calls of a function are a stage (named after it)'''
+    name = f.__qualname__
+    @wraps(f)
+    def run(*args : Any, **kwargs : Any) -> T:
+        if _profiler is None: return f(*args, **kwargs)
+        with _profiler.stage(name): return f(*args, **kwargs)
+    return run
+
+def output(name : str, text : str, section : bool = False) -> None:
+    '''Count text produced by a stage, if profiling'''
+    if _profiler is not None: _profiler.output(name,text,section)
+
+class Interner(object):
+    '''
+    Hash-consing table for Compact nodes. While one is active (see interning),
+    constructing a node with the same arguments as an earlier one returns the
+    earlier object instead of building a new one.
+    '''
+    def __init__(self) -> None:
+        self.table   = {} # type: D[tuple,Any]
+        self.created = Counter() # type: Counter
+        self.reused  = Counter() # type: Counter
+
+    def __str__(self) -> str:
+        return 'Interner<%d created, %d reused>'%(sum(self.created.values()),
+                                                  sum(self.reused.values()))
+
+    def stats(self) -> D[str,Tup[int,int]]:
+        '''(created, reused) counts for each node type'''
+        return {k:(self.created[k],self.reused[k])
+                    for k in sorted(set(self.created)|set(self.reused))}
+
+    def report(self) -> str:
+        rows = ['%-20s %8d created %8d reused'%(k,c,r)
+                    for k,(c,r) in self.stats().items()]
+        return '\n'.join(rows + [str(self)])
+
+_interner = None # type: O[Interner]
+
+@contextmanager
+def interning() -> I[Interner]:
+    '''Share structurally identical Compact nodes within a block. Nested blocks
+       use the outermost table.'''
+    global _interner
+    if _interner is not None:
+        yield _interner
+        return
+    _interner = Interner()
+    try:     yield _interner
+    finally: _interner = None
+
+_building = object() # the _hash of a Compact node until its __init__ returns
+
+class Interned(ABCMeta):
+    '''
+    Metaclass of Compact: constructor calls go through the active Interner,
+    and nodes are frozen once built
+    '''
+    def build(cls, *args : Any, **kwargs : Any) -> Any:
+        obj = super().__call__(*args, **kwargs)
+        object.__setattr__(obj, '_hash', None)
+        return obj
+
+    def __call__(cls, *args : Any, **kwargs : Any) -> Any:
+        tab = _interner
+        if tab is None or not cls._interned: # type: ignore
+            return cls.build(*args, **kwargs)
+        key = (cls, args, tuple(kwargs.items()))
+        try:
+            obj = tab.table.get(key)
+        except TypeError: # unhashable argument
+            return cls.build(*args, **kwargs)
+        name = '%s.%s'%(cls.__module__.split('.')[-1], cls.__name__)
+        if obj is None:
+            obj = tab.table[key] = cls.build(*args, **kwargs)
+            tab.created[name] += 1
+        else:
+            tab.reused[name] += 1
+        return obj
+
+class Compact(Base, metaclass = Interned):
+    '''
+    Base for small nodes which are created in very large numbers: fields live
+    in __slots__ (declared by the subclass) rather than in a per-object dict.
+
+    These are values: assigning a field outside of __init__ raises, so copies
+    can share them, their hash is cached and they can be interned (unless
+    _interned is False, as when they refer to mutable nodes: then neither)
+    '''
+    __slots__ = ('_hash',)
+    _hash     : Any # the cached hash (None until computed, _building in __init__)
+    _interned = True
+
+    def __setattr__(self, key : str, val : Any) -> None:
+        if self._hash is not _building:
+            raise AttributeError('%s nodes are immutable (cannot set %s)'%(
+                                    type(self).__name__,key))
+        object.__setattr__(self, key, val)
+
+    def __copy__(self : T) -> T: return self
+    def __deepcopy__(self : T, memo : dict) -> T: return self
+
+    def __getstate__(self) -> L[Any]:
+        return self._values() # (a cached hash is only valid in this process)
+
+    def __setstate__(self, state : L[Any]) -> None:
+        for k,v in zip(self.__slots__, state): object.__setattr__(self, k, v)
+        object.__setattr__(self, '_hash', None)
+
+    def __new__(cls, *args : Any, **kwargs : Any) -> Any:
+        self = object.__new__(cls)
+        object.__setattr__(self, '_hash', _building)
+        return self
+
+    def _state(self) -> D[str,Any]:
+        return {k:getattr(self,k) for k in self.__slots__}
+
+    def _values(self) -> L[Any]:
+        return [getattr(self,k) for k in self.__slots__]
+
+    def _same(self, other : Any) -> bool:
+        # cached hashes are cheap to compare, and mostly differ if nodes do
+        return hash(self) == hash(other) and self._values() == other._values()
+
+    def __hash__(self) -> int:
+        h = self._hash
+        if h is None or h is _building:
+            h = hash((type(self).__name__,) + tuple([
+                    hash(v) if type(v) in _atoms else structhash(v)
+                        for v in self._values()]))
+            # (not if a field is a mutable node, or during __init__)
+            if self._interned and self._hash is None: object.__setattr__(self, '_hash', h)
+        return h
+
+_atoms = frozenset([str,int,float,bool,type(None)])
+
+def structhash(x : Any) -> int:
+    '''Hash of a (possibly nested) field value, consistent with =='''
+    t = type(x)
+    if t in _atoms or isinstance(x, Base):
+        return hash(x)
+    elif isinstance(x, dict):
+        return hash(frozenset([(k, structhash(v)) for k,v in x.items()]))
+    elif isinstance(x, (set,frozenset)):
+        return hash(frozenset([structhash(v) for v in x]))
+    elif isinstance(x, (list,tuple)):
+        return hash(tuple([structhash(v) for v in x]))
+    try:
+        return hash(x)
+    except TypeError:
+        return hash(str(x))
+
+def digest(x : Any, memo : D[int,str] = None) -> str:
+    '''
+    Content fingerprint of a (possibly nested) field value which, unlike hash()
+    and structhash(), is the same in every Python process. Sets and dicts are
+    put in a canonical order. Digests of Base nodes are stored in memo (keyed by
+    id, so only valid while the nodes are alive and unmodified), so that nodes
+    shared by many others are only traversed once.
+    '''
+    if memo is None: memo = {}
+    def canon(x : Any) -> str:
+        t = type(x)
+        if t in _atoms:
+            return '%s:%r'%(t.__name__,x)
+        elif isinstance(x, Base):
+            d = memo.get(id(x))
+            if d is None:
+                body = ','.join(map(canon, x._values()))
+                d = memo[id(x)] = sha1(('%s(%s)'%(t.__name__,body)).encode()).hexdigest()
+            return d
+        elif isinstance(x, dict):
+            return '{%s}'%','.join(sorted('%s:%s'%(canon(k),canon(v))
+                                            for k,v in x.items()))
+        elif isinstance(x, (set,frozenset)):
+            return '{%s}'%','.join(sorted(map(canon,x)))
+        elif isinstance(x, (list,tuple)):
+            return '[%s]'%','.join(map(canon,x))
+        return '%s:%s'%(t.__name__,x)
+    return sha1(canon(x).encode()).hexdigest()
+
 class Showable(Base,metaclass=ABCMeta):
+    __slots__ = ()
     @abstractmethod
     def show(self,f:Fn)->str:
         """ Apply function recursively to fields """
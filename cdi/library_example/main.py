@@ -84,5 +84,4 @@ overlap = Overlap(
 
 if __name__ == '__main__':
     m  = Migrate(src = src, tar = tar, overlap = overlap, funcs = funcs)
-    fi = m.file(src = isrc, tar = itar)
-    with open('cdi/library_example/lib.cql','w') as f: f.write(fi)
+    with open('cdi/library_example/lib.cql','w') as f: m.write(f, src = isrc, tar = itar)
@@ -33,13 +33,11 @@ def main()->None:
                 filt1   = fOQMD,
                 funcs   = funcs) # type: dict
 
-    fi1  = Migrate(**args).file(src = oqmd_db, tar = Instance(), merged = merged_db)
+    with open(root+'migrate.cql','w') as f:
+        Migrate(**args).write(f, src = oqmd_db, tar = Instance(), merged = merged_db)
 
-    fi2  = Merge(**args).file(src = oqmd_db, tar = Instance(), merged = merged_db)
-
-
-    with open(root+'migrate.cql','w') as f: f.write(fi1)
-    with open(root+'merge.cql',  'w') as f: f.write(fi2)
+    with open(root+'merge.cql',  'w') as f:
+        Merge(**args).write(f, src = oqmd_db, tar = Instance(), merged = merged_db)
 
 ################################################################################
 if __name__=='__main__':